@@ -0,0 +1,4 @@
+import sys
+from Python.cli import main
+
+main(sys.argv[1:])
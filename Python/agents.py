@@ -0,0 +1,174 @@
+import copy
+import numpy as np
+from Python.columns import ColumnBuffer
+from Python.engine import Engine
+from Python.ledger import AccountingError
+
+class AgentEngine(Engine):
+    """
+    Fiat economy of individual workers, capitalists and firms
+
+    Each population is a set of NumPy columns (cash, employer, owner, ...),
+    so hiring, payroll, consumption and dividends are vectorized over the
+    agents. The frame follows `Engine.fiat_econ_frame` rule for rule but
+    applies it agent by agent, then posts the sector totals through the
+    usual ledger operations, so the Workers, Capitalists and Firms balance
+    sheets are the sums of their agents. Monetary params are per 100
+    workers, the size of the aggregate model, and scale with `workers`.
+
+    Firms are founded by capitalists out of spare cash, as in the aggregate
+    model, and each looks to hire 3 idle workers; sales go to firms in
+    proportion to their headcount (plus one).
+    """
+    WORKERS_PER_FIRM = 3
+
+    def __init__(self, workers=1000, capitalists=10, params=None, seed=None):
+        self.scale = workers / 100
+        self.rng = np.random.default_rng(seed)
+        self.workers = ColumnBuffer([('cash', np.float64), ('employer', np.int64)], workers)
+        self.workers.extend(np.zeros(workers), np.full(workers, -1))
+        self.capitalists = ColumnBuffer([('cash', np.float64), ('investments', np.float64)], capitalists)
+        self.capitalists.extend(np.zeros(capitalists), np.zeros(capitalists))
+        self.firms = ColumnBuffer([('cash', np.float64), ('owner', np.int64), ('founded', np.int32)])
+        super().__init__('fiat', params)
+        self.model.worker_pool = workers
+        self.model.idle_workers = workers
+
+    @property
+    def populations(self):
+        return {'Workers': self.workers, 'Capitalists': self.capitalists, 'Firms': self.firms}
+
+    def fork(self, params=None):
+        clone = super().fork(params)
+        clone.rng = copy.deepcopy(self.rng)
+        clone.workers = self.workers.fork()
+        clone.capitalists = self.capitalists.fork()
+        clone.firms = self.firms.fork()
+        return clone
+
+    def check(self):
+        """Engine.check, plus every sector sheet against the sum of its agents"""
+        super().check()
+        sheets = self.model.balance_sheets
+        sums = {
+            ('Workers', ('Assets', 'Cash')): self.workers['cash'].sum(),
+            ('Capitalists', ('Assets', 'Cash')): self.capitalists['cash'].sum(),
+            ('Capitalists', ('Assets', 'Investments')): self.capitalists['investments'].sum(),
+            ('Firms', ('Assets', 'Cash')): self.firms['cash'].sum()
+        }
+        for (actor, account), total in sums.items():
+            balance = sheets[actor].get(account)
+            if abs(total - balance) > self.tolerance * (1 + abs(balance)):
+                raise AccountingError(f'{actor} agents hold {total:.6g} of {account[1]}, the sheet {balance:.6g}')
+
+    @staticmethod
+    def gini(values):
+        """Gini coefficient of non-negative values"""
+        values = np.sort(np.maximum(values, 0))
+        total = values.sum()
+        if total == 0:
+            return 0.0
+        n = len(values)
+        return max(0.0, float((2 * np.arange(1, n + 1) - n - 1) @ values / (n * total)))
+
+    def sales(self, firm_cash, amount, headcount):
+        # each firm's share of sales is its headcount plus one
+        weights = headcount + 1.0
+        firm_cash += amount * weights / weights.sum()
+
+    def fiat_econ_frame(self):
+        model = self.model
+        model.next_month()
+        for population in self.populations.values():
+            population.own()
+        rng = self.rng
+        k_cash = self.capitalists['cash']
+        k_investments = self.capitalists['investments']
+        w_cash = self.workers['cash']
+        employer = self.workers['employer']
+        deflator = 1 / (model.current_cpi / model.starting_cpi)
+        wage_deflator = 1 / (model.current_worker_wage / model.starting_worker_wage)
+        w_propensity, k_propensity = self.propensities()
+
+        # spend on capitalists equally, or tax them in proportion to their cash
+        govt_surplus = self.params['budget_surplus'] * self.scale / 12.0
+        govt_spending = max(-govt_surplus, 0)
+        self.fiscal_op(govt_surplus)
+        taxable = np.maximum(k_cash, 0)
+        if govt_surplus > 0 and taxable.sum() > 0:
+            k_cash -= govt_surplus * taxable / taxable.sum()
+        else:
+            k_cash -= govt_surplus / len(k_cash)
+
+        # every capitalist with spare cash founds as many firms as it can afford
+        capitalists_reserve = 3 * self.scale / len(k_cash)
+        nom_startup_capital = model.real_startup_cap / deflator
+        spare_cash = k_cash - capitalists_reserve
+        founded = np.where(spare_cash > nom_startup_capital, np.floor(spare_cash / nom_startup_capital), 0).astype(np.int64)
+        new_businesses = int(founded.sum())
+        i = nom_startup_capital * new_businesses
+        if new_businesses:
+            self.invest(i)
+            k_cash -= nom_startup_capital * founded
+            k_investments += nom_startup_capital * founded
+            first = len(self.firms)
+            self.firms.extend(
+                np.full(new_businesses, nom_startup_capital),
+                np.repeat(np.arange(len(k_cash)), founded),
+                np.full(new_businesses, model.month)
+            )
+        firm_cash = self.firms['cash']
+        earnings = 0.1 * firm_cash  # <-- dividends are paid on cash before this month's payroll and sales
+
+        # new firms hire idle workers, otherwise some workers are laid off
+        if new_businesses:
+            idle = np.flatnonzero(employer < 0)
+            hires = min(len(idle), new_businesses * self.WORKERS_PER_FIRM)
+            openings = np.repeat(np.arange(first, first + new_businesses), self.WORKERS_PER_FIRM)
+            employer[rng.choice(idle, hires, replace=False)] = openings[:hires]
+        else:
+            employed = np.flatnonzero(employer >= 0)
+            layoffs = min(len(employed), int(round(self.scale)))
+            employer[rng.choice(employed, layoffs, replace=False)] = -1
+        employed = employer >= 0
+        unemp = self.labour_market(model.worker_pool - int(employed.sum()))
+
+        # firms pay workers
+        wage = model.current_worker_wage
+        headcount = np.bincount(employer[employed], minlength=len(firm_cash))
+        payroll = wage * (model.worker_pool - model.idle_workers)
+        self.pay_workers(payroll)
+        w_cash[employed] += wage
+        firm_cash -= wage * headcount
+
+        # capitalists who own firms consume out of spare cash
+        k_consumption = np.where(k_investments > 0, np.maximum(0, k_propensity * spare_cash), 0)
+        k_total = k_consumption.sum()
+        if k_total > 0:
+            self.capitalists_consume(k_total)
+            k_cash -= k_consumption
+            self.sales(firm_cash, k_total, headcount)
+
+        # workers consume once there are firms to buy from
+        w_total = 0.0
+        if k_investments.sum() > 0:
+            w_consumption = w_propensity * w_cash
+            w_total = w_consumption.sum()
+            self.workers_consume(w_total)
+            w_cash -= w_consumption
+            self.sales(firm_cash, w_total, headcount)
+
+        # firms pay their owners
+        self.pay_capitalists(earnings.sum())
+        firm_cash -= earnings
+        k_cash += np.bincount(self.firms['owner'], earnings, minlength=len(k_cash))
+
+        # calculate econ indicators
+        gdp = w_total + k_total + i + govt_spending
+        row = self.fiat_row(gdp, unemp, payroll, new_businesses, deflator, wage_deflator)
+        row.update({
+            'Firms': len(firm_cash),
+            'Worker Cash Gini': self.gini(w_cash),
+            'Capitalist Cash Gini': self.gini(k_cash)
+        })
+        model.fiat_indicators.append_row(model.fiat_trailing.update(row))
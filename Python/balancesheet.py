@@ -1,188 +1,182 @@
-import pandas as pd
+import copy
+import numpy as np
+from Python.ledger import Ledger
 
 class BalanceSheet:
     """
     Cumulative Balance Sheet for an economic actor
+
+    The sheet is one row of a `Ledger`, the (actors x accounts) matrix
+    holding the whole economy's balances; without one it gets a ledger of
+    its own. It remembers which accounts were opened on it and in what
+    order, and `df` is only built when somebody looks at it. If a `Journal`
+    is given, every flow is also recorded there.
+
+    With `size=N` every account holds a vector of N independent economies
+    and flows may be scalars or length-N arrays (see `Python.ensemble`).
+    On a fixed-point ledger flows are rounded to its minor units as they
+    are posted, and the journal records the rounded amounts.
     """
     TOP_ACCOUNTS = ['Assets', 'Liabilities', 'Equity', 'Liabs & Eq']
+    TYPES = Ledger.TYPES
 
-    def __init__(self, actor):
+    def __init__(self, actor, journal=None, size=None, ledger=None):
         self.actor = actor
-        self.df = pd.DataFrame(
-            data={actor: [0 for i in self.TOP_ACCOUNTS]},
-            index=pd.MultiIndex.from_product([self.TOP_ACCOUNTS, ['Total']])
-        )
-        self.df.index.names = ['Balance Sheet', 'Account']
+        self.size = size
+        self.shape = () if size is None else (size,)
+        self.ledger = Ledger([actor], size) if ledger is None else ledger
+        self.row = self.ledger.rows[actor]
+        self.accounts = []  # <-- (type, name) in the order they were opened
+        self.slots = {}  # <-- (type, name) -> column in the ledger
+        self._df = None
+        self.version = 0  # <-- bumped on every change, so views can tell what to repaint
+        self.journal = None
+        if journal is not None:
+            self.attach(journal)
+
+    def attach(self, journal):
+        """Record every subsequent flow in `journal`"""
+        self.journal = journal
+        self.actor_code = journal.actor_code(self.actor)
+        for account in self.accounts:
+            journal.account_code(account)
+
+    def fork(self, journal=None, ledger=None):
+        """Independent copy on `ledger` (a copy of this one by default), recording into `journal` if given"""
+        clone = copy.copy(self)
+        clone.ledger = self.ledger.copy() if ledger is None else ledger
+        clone.accounts = list(self.accounts)
+        clone.slots = dict(self.slots)
+        clone.journal = None
+        if journal is not None:
+            clone.attach(journal)
+        return clone
+
+    @property
+    def balances(self):
+        """This actor's row of the ledger, indexed by `slots`"""
+        return self.ledger.balances[self.row]
+
+    @property
+    def totals(self):
+        return self.ledger.totals[self.row]
+
+    def values(self):
+        """Balances of the opened accounts, in the order of `accounts`"""
+        return self.ledger.money(self.ledger.balances[self.row, [self.slots[account] for account in self.accounts]])
 
     def add_account(self, type, name, balance=0):
-        df2 = pd.DataFrame(
-            data={self.actor: [balance]},
-            index=pd.MultiIndex.from_arrays([[type], [name]])
-        )
-        self.df = self.df.append(df2)
-        self.calc_totals()
-        self.sort_df()
+        slot = self.slot((type, name))
+        balance = self.ledger.units(balance)
+        if self.journal is not None:
+            self.journal.record(self.actor_code, self.journal.account_code((type, name)), self.journal.OPENING, self.ledger.money(balance))
+        self.ledger.balances[self.row, slot] += balance
+        self.ledger.totals[self.row, self.ledger.types[slot]] += balance
+        self.touch()
+
+    def slot(self, account):
+        """Return the ledger column of an account, opening it on this sheet if needed"""
+        try:
+            return self.slots[account]
+        except KeyError:
+            pass
+        slot = self.ledger.column(account)
+        self.accounts.append(account)
+        self.slots[account] = slot
+        if self.journal is not None:
+            self.journal.account_code(account)
+        self.touch()
+        return slot
 
     def add_flow(self, account_in, account_out, amount):
         # add the accounts if they're not already available
-        for acct in [account_in, account_out]:
-            if acct not in self.df.index:
-                self.add_account(acct[0], acct[1])
-
-        in_type = account_in[0]
-        out_type = account_out[0]
-        self.df.loc[account_in] += amount
-        if in_type == 'Assets' and out_type in ['Liabilities', 'Equity']:
-            # increase an asset & increase a liab/equity to balance
-            self.df.loc[account_out] += amount
-        elif in_type in ['Liabilities', 'Equity'] and out_type =='Assets':
-            # increase a liab/equity and increase an asset to balance
-            self.df.loc[account_out] += amount
+        slot_in = self.slot(account_in)
+        slot_out = self.slot(account_out)
+
+        ledger = self.ledger
+        amount = ledger.units(amount)
+        balances = ledger.balances
+        totals = ledger.totals
+        types = ledger.types
+        row = self.row
+        in_assets = account_in[0] == 'Assets'
+        out_assets = account_out[0] == 'Assets'
+        balances[row, slot_in] += amount
+        totals[row, types[slot_in]] += amount
+        if in_assets != out_assets:
+            # increase an asset & increase a liab/equity to balance (or vice versa)
+            balances[row, slot_out] += amount
+            totals[row, types[slot_out]] += amount
         else:
             # offset an increase with a decrease of the same account type
-            self.df.loc[account_out] -= amount
-        
-        # recalculate the totals
-        self.calc_totals()
+            balances[row, slot_out] -= amount
+            totals[row, types[slot_out]] -= amount
+        self.touch()
+        if self.journal is not None:
+            journal = self.journal
+            journal.record(self.actor_code, journal.account_code(account_in), journal.account_code(account_out), ledger.money(amount))
+
+    def touch(self):
+        self._df = None
+        self.version += 1
+
+    def get(self, account, default=0.0):
+        """Balance of a (type, name) account, or `default` if it was never opened"""
+        try:
+            value = self.ledger.money(self.ledger.balances[self.row, self.slots[account]])
+        except KeyError:
+            return default if self.size is None else np.full(self.size, default)
+        return float(value) if self.size is None else value.copy()
+
+    def total(self, type):
+        totals = self.ledger.money(self.ledger.totals[self.row])
+        if type == 'Liabs & Eq':
+            value = totals[1] + totals[2]
+        else:
+            value = totals[self.TYPES[type]]
+        return float(value) if self.size is None else value.copy()
 
     def calc_totals(self):
-        for account in self.TOP_ACCOUNTS:
-            sum_accounts = self.df.loc[account].sum()[0]
-            old_total = self.df.loc[account, 'Total'][0]
-            new_sum = sum_accounts - old_total
-            self.df.loc[account, 'Total'] = new_sum
-        self.df.loc['Liabs & Eq', 'Total'] = self.df.loc['Liabilities', 'Total'][0] + self.df.loc['Equity', 'Total'][0]
-
-    def sort_df(self):
-        l = []
-        for i in self.df.index:
-            if i[0] == 'Assets':
-                l.append(1)
-            elif i[0] == 'Liabilities':
-                l.append(2)
-            else:
-                l.append(3)
-
-            if i[1] == 'Total':
-                l[-1] += 0.1
-
-        self.df['sort'] = l
-        self.df.sort_values(by='sort', inplace=True)
-        del self.df['sort']
-
-    def make_loan(self, amt):
-        if self.actor == 'Banks':
-            # add to loan asset, subtract from cash
-            self.add_flow(('Assets', 'Capitalists Loans'), ('Assets', 'Cash'), amt)
-            # add to capitalists accounts, subtract from reserves
-            self.add_flow(('Liabilities', 'Capitalists Accounts'), ('Equity', 'Bank Reserves'), amt)
-            
-        elif self.actor == 'Capitalists':
-            # add to cash asset, offset with loan liability
-            self.add_flow(('Assets', 'Cash'), ('Liabilities', 'Capitalists Loans'), amt)
-            
-    def invest(self, amt):
-        if self.actor == 'Firms':
-            # add to cash, offset with equity
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Firm Equity'), amt)
-            
-        elif self.actor == 'Capitalists':
-            # add Firm Equity, reduce cash
-            self.add_flow(('Assets', 'Investments'), ('Assets', 'Cash'), amt)
-            
-        elif self.actor == 'Banks':
-            # move cash from capitalist accounts to firm accounts
-            self.add_flow(('Liabilities', 'Firm Accounts'), ('Liabilities', 'Capitalists Accounts'), amt)
-            
-    def pay_workers(self, amt):
-        if self.actor == 'Firms':
-            # take cash, offset with reduction in equity
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Firm Equity'), -amt)
-            
-#         elif self.actor == 'Capitalists':
-#             # markdown firm equity asset
-#             self.add_flow(('Assets', 'Investments'), ('Equity', 'Firm Profit(Loss)'), -amt)
-        
-        elif self.actor == 'Workers':
-            # add to cash, offset with equity
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Wages'), amt)
-            
-        elif self.actor == 'Banks':
-            # move money from firm accounts to worker accounts
-            self.add_flow(('Liabilities', 'Worker Accounts'), ('Liabilities', 'Firm Accounts'), amt)
-            
-    def pay_capitalists(self, amt):
-        if self.actor == 'Firms':
-            # take cash, offset with reduction in equity
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Firm Equity'), -amt)
-        
-        elif self.actor == 'Capitalists':
-            # add to cash, offset with equity
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Dividends'), amt)
-            
-        elif self.actor == 'Banks':
-            # move money from firm accounts to capitalists accounts
-            self.add_flow(('Liabilities', 'Capitalists Accounts'), ('Liabilities', 'Firm Accounts'), amt)
-            
-    def workers_consume(self, amt):
-        if self.actor == 'Firms':
-            # record revenue
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Firm Equity'), amt)
-            
-#         elif self.actor == 'Capitalists':
-#             # markdown firm equity asset
-#             self.add_flow(('Assets', 'Firm Equity'), ('Equity', 'Firm Profit(Loss)'), amt)
-        
-        elif self.actor == 'Workers':
-            # reduce cash and equity
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Consumption'), -amt)
-            
-        elif self.actor == 'Banks':
-            # move money from worker accounts to firm accounts
-            self.add_flow(('Liabilities', 'Firm Accounts'), ('Liabilities', 'Worker Accounts'), amt)
-            
-    def capitalists_consume(self, amt):
-        if self.actor == 'Firms':
-            # record revenue
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Firm Equity'), amt)
-            
-        elif self.actor == 'Capitalists':
-#             # markdown firm equity asset
-#             self.add_flow(('Assets', 'Firm Equity'), ('Equity', 'Firm Profit(Loss)'), amt)
-            # consumption
-            self.add_flow(('Assets', 'Cash'), ('Equity', 'Consumption'), -amt)
-            
-        elif self.actor == 'Banks':
-            # move money from capitalists accounts to firm accounts
-            self.add_flow(('Liabilities', 'Firm Accounts'), ('Liabilities', 'Capitalists Accounts'), amt)
-            
-    def repay_loan(self, amt):
-        if self.actor == 'Banks':
-            # add to cash, subtract from capitalists loan
-            self.add_flow(('Assets','Cash'), ('Assets', 'Capitalists Loans'), amt)
-            # add to bank reserves, subtract from capitalists accounts
-            self.add_flow(('Equity', 'Bank Reserves'), ('Liabilities', 'Capitalists Accounts'), amt)
-            
-        elif self.actor == 'Capitalists':
-            # reduce cash, offset with reduction in liab
-            self.add_flow(('Assets', 'Cash'), ('Liabilities', 'Capitalists Loans'), -amt)
-            
-    def fiscal_op(self, amt):
-        if amt <= 0:
-            treasury_acct = 'Spending'
-            cap_acct = ('Liabilities', 'Govt Contracts')
+        """Recompute the totals from scratch (they are normally kept incrementally)"""
+        slots = [self.slots[account] for account in self.accounts]
+        totals = np.zeros((len(self.TYPES),) + self.shape, dtype=self.ledger.totals.dtype)
+        np.add.at(totals, self.ledger.types[slots], self.ledger.balances[self.row, slots])
+        self.ledger.totals[self.row] = totals
+        self.touch()
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = self.build_df()
+        return self._df
+
+    def build_df(self):
+        import pandas as pd
+        index = []
+        values = []
+        balances = self.ledger.money(self.ledger.balances[self.row])
+        totals = self.ledger.money(self.ledger.totals[self.row])
+        for type, t in self.TYPES.items():
+            for account in self.accounts:
+                if account[0] == type:
+                    index.append(account)
+                    values.append(balances[self.slots[account]])
+            index.append((type, 'Total'))
+            values.append(totals[t])
+        index.append(('Liabs & Eq', 'Total'))
+        values.append(totals[1] + totals[2])
+
+        if self.size is None:
+            df = pd.DataFrame(
+                data={self.actor: values},
+                index=pd.MultiIndex.from_tuples(index)
+            )
         else:
-            treasury_acct = 'Taxes'
-            cap_acct = ('Equity', 'Taxes Paid')
-            
-        if self.actor == 'Treasury':
-            # spend or tax firms
-            self.add_flow(('Assets',  'Cash'), ('Equity', treasury_acct), amt)
-            
-        elif self.actor == 'Capitalists':
-            # collect from Treasury
-            self.add_flow(('Assets', 'Cash'), cap_acct, -amt)
-
-                
-                
-            
+            # one column per economy
+            df = pd.DataFrame(
+                data=np.array(values),
+                index=pd.MultiIndex.from_tuples(index),
+                columns=pd.RangeIndex(self.size, name=self.actor)
+            )
+        df.index.names = ['Balance Sheet', 'Account']
+        return df
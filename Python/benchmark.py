@@ -0,0 +1,185 @@
+"""
+Benchmarks for the ledger, the frame functions and long runs
+
+    python -m Python.benchmark --out bench.json
+    python -m Python.benchmark --quick --compare bench.json
+
+Results are written as JSON together with the git commit they were taken
+at, so two runs can be compared with --compare.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import timeit
+import tracemalloc
+from datetime import datetime, timezone
+from time import perf_counter
+import numpy as np
+from Python.balancesheet import BalanceSheet
+from Python.engine import Engine
+from Python.journal import Journal
+
+HORIZONS = {'credit': 300, 'fiat': 120}  # <-- 25 and 10 years
+FIAT_PARAMS = {'budget_surplus': -20}
+
+
+def per_call(fn, repeat=5):
+    """Best per-call time of `fn` in seconds"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat, number)) / number
+
+
+def engine(economy):
+    return Engine(economy, FIAT_PARAMS if economy == 'fiat' else None)
+
+
+def ledger_ops():
+    """Latency of single postings, in microseconds"""
+    results = {}
+    bs = BalanceSheet('Firms')
+    bs.add_flow(('Assets', 'Cash'), ('Equity', 'Firm Equity'), 1.0)
+    results['add_flow'] = per_call(lambda: bs.add_flow(('Assets', 'Cash'), ('Equity', 'Firm Equity'), 1.0))
+    journaled = BalanceSheet('Firms', Journal())
+    results['add_flow journaled'] = per_call(lambda: journaled.add_flow(('Assets', 'Cash'), ('Equity', 'Firm Equity'), 1.0))
+    results['calc_totals'] = per_call(bs.calc_totals)
+    results['get'] = per_call(lambda: bs.get(('Assets', 'Cash')))
+
+    credit = engine('credit')
+    credit.run(12)
+    results['operation invest'] = per_call(lambda: credit.invest(1.0))
+    results['ledger check'] = per_call(credit.check)
+
+    def build_df():
+        sheet = credit.model.balance_sheets['Banks']
+        sheet.touch()
+        return sheet.df
+    results['balance sheet df'] = per_call(build_df, repeat=3)
+    return {name: seconds * 1e6 for name, seconds in results.items()}
+
+
+def throughput(months=None):
+    """Headless frames per second of each economy"""
+    results = {}
+    for economy, horizon in HORIZONS.items():
+        e = engine(economy)
+        n = months or horizon
+        started = perf_counter()
+        e.run(n)
+        results[economy] = n / (perf_counter() - started)
+    return results
+
+
+def long_runs(scales=(1, 100)):
+    """Wall time and peak traced memory of runs of `scale` times the usual horizon"""
+    results = {}
+    for economy, horizon in HORIZONS.items():
+        for scale in scales:
+            months = horizon * scale
+            e = engine(economy)
+            started = perf_counter()
+            e.run(months)
+            wall = perf_counter() - started
+            # a second run under tracemalloc, which slows things down too much to time
+            tracemalloc.start()
+            e = engine(economy)
+            e.run(months)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            results[f'{economy} {months}M'] = {'months': months, 'seconds': wall, 'peak MB': peak / 2**20}
+    return results
+
+
+def history_scaling(checkpoints=(100, 1000, 10000), sample=100):
+    """Frames per second over `sample` months once the history is `checkpoints` long"""
+    results = {}
+    for economy in HORIZONS:
+        e = engine(economy)
+        rates = {}
+        done = 0
+        for checkpoint in checkpoints:
+            e.run(checkpoint - done)
+            started = perf_counter()
+            e.run(sample)
+            rates[checkpoint] = sample / (perf_counter() - started)
+            done = checkpoint + sample
+        results[economy] = rates
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(quick=False):
+    """Run every benchmark and return the results with their environment"""
+    if quick:
+        scales, checkpoints = (1, 10), (100, 1000)
+    else:
+        scales, checkpoints = (1, 100), (100, 1000, 10000)
+    return {
+        'commit': git_commit(),
+        'time': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.platform(),
+        'quick': quick,
+        'ledger ops (us)': ledger_ops(),
+        'months per second': throughput(),
+        'long runs': long_runs(scales),
+        'months per second by history length': history_scaling(checkpoints)
+    }
+
+
+def flatten(results, prefix=''):
+    """{'a': {'b': 1}} -> {'a / b': 1} for the numeric leaves"""
+    flat = {}
+    for key, value in results.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + ' / '))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def report(results, baseline=None):
+    flat = flatten(results)
+    old = {} if baseline is None else flatten(baseline)
+    width = max(len(name) for name in flat)
+    for name, value in flat.items():
+        line = f'{name:<{width}}  {value:>12.4g}'
+        if old.get(name):
+            line += f'  {value / old[name]:>6.2f}x'
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m Python.benchmark', description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to show ratios against')
+    parser.add_argument('--quick', action='store_true', help='10x instead of 100x horizons, shorter histories')
+    args = parser.parse_args(argv)
+
+    results = run(args.quick)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"against {baseline.get('commit')}")
+    report(results, baseline)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,180 @@
+"""
+Headless runs from the command line
+
+    python -m Python run --economy fiat --months 120 --surplus -20 --out results.parquet
+    python -m Python run deficit.json austerity.json --out results/
+    python -m Python serve --economy fiat --surplus -20
+
+A scenario file holds a JSON object, or a list of them, with any of
+'name', 'economy', 'months', 'params', 'loan_book' and 'out'. Flags on
+the command line override every scenario. An --out ending in .parquet or .arrow gets
+the indicator table, .csv the same as CSV, anything else is a directory
+written by `storage.save` with the balance sheets too. Without --out the
+last month's indicators are printed. `serve` runs one scenario live for
+browsers on localhost (see `Python.server`).
+
+Only the engine is imported: pandas, pyarrow and the notebook UI are
+loaded when (and if) a run needs them.
+"""
+import argparse
+import json
+import os
+import sys
+from time import perf_counter
+from Python.engine import DEFAULT_MONTHS, Engine
+
+TABLE_FORMATS = ('.parquet', '.arrow', '.csv')
+
+
+def parse_param(text):
+    """NAME=VALUE, the value read as JSON where it parses (numbers, true/false) and as a string otherwise"""
+    name, sep, value = text.partition('=')
+    if not sep:
+        raise argparse.ArgumentTypeError(f'expected NAME=VALUE, got {text!r}')
+    try:
+        return name, json.loads(value)
+    except ValueError:
+        return name, value
+
+
+def load_scenarios(paths):
+    scenarios = []
+    for path in paths:
+        with open(path) as f:
+            loaded = json.load(f)
+        loaded = loaded if isinstance(loaded, list) else [loaded]
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for k, scenario in enumerate(loaded):
+            scenario = dict(scenario)
+            scenario.setdefault('name', stem if len(loaded) == 1 else f'{stem}-{k}')
+            scenarios.append(scenario)
+    return scenarios or [{'name': 'run'}]
+
+
+def output_path(out, name, several):
+    # several runs sharing one --out get their name added to it
+    if not several:
+        return out
+    root, ext = os.path.splitext(out)
+    if ext in TABLE_FORMATS:
+        return f'{root}-{name}{ext}'
+    return os.path.join(out, name)
+
+
+def write(engine, path):
+    from Python import storage
+    ext = os.path.splitext(path)[1]
+    if ext == '.csv':
+        engine.indicators.df.to_csv(path, index_label='month')
+    elif ext in TABLE_FORMATS:
+        storage.write_table(storage.indicator_table(engine), path)
+    else:
+        storage.save(engine, path)
+
+
+def overrides(args):
+    # params given as flags, which win over scenario files
+    params = dict(args.param)
+    if args.surplus is not None:
+        params['budget_surplus'] = args.surplus
+    if args.reserves is not None:
+        params['required_bank_reserves'] = args.reserves
+    return params
+
+
+def scenario_engine(args, parser, scenario):
+    economy = args.economy or scenario.get('economy', 'credit')
+    if economy not in Engine.DEFAULT_PARAMS:
+        parser.error(f"{scenario['name']}: unknown economy {economy!r}")
+    params = dict(scenario.get('params', {}))
+    params.update(overrides(args))
+    unknown = set(params) - set(Engine.DEFAULT_PARAMS[economy])
+    if unknown:
+        parser.error(f"{scenario['name']}: no {', '.join(sorted(unknown))} param in the {economy} economy")
+    loan_book = args.loan_book or scenario.get('loan_book', False)
+    if loan_book and economy != 'credit':
+        parser.error(f"{scenario['name']}: the loan book is only in the credit economy")
+    return Engine(economy, params, minor_units=args.minor_units, loan_book=loan_book)
+
+
+def scenario_months(args, parser, scenario, default):
+    # --months 0 is a mistake, not a request for the default
+    months = args.months if args.months is not None else scenario.get('months', default)
+    if months is not None and (not isinstance(months, int) or isinstance(months, bool) or months < 1):
+        parser.error(f"{scenario['name']}: months must be a whole number of at least 1, not {months!r}")
+    return months
+
+
+def run(args, parser):
+    scenarios = load_scenarios(args.scenarios)
+    several = len(scenarios) > 1
+
+    for scenario in scenarios:
+        start = perf_counter()
+        engine = scenario_engine(args, parser, scenario)
+        economy = engine.economy
+        months = scenario_months(args, parser, scenario, DEFAULT_MONTHS[economy])
+        engine.check_every = args.check_every
+        engine.advance(months)
+        elapsed = perf_counter() - start
+
+        out = output_path(args.out, scenario['name'], several) if args.out else scenario.get('out')
+        if out:
+            write(engine, out)
+            print(f"{scenario['name']}: {economy}, {months} months in {elapsed:.3f}s -> {out}", file=sys.stderr)
+        else:
+            print(f"{scenario['name']}: {economy}, {months} months in {elapsed:.3f}s")
+            for col, value in engine.indicators.last().items():
+                print(f'  {col:<24} {value:.6g}')
+
+
+def serve(args, parser):
+    from Python.server import DashboardServer
+    scenarios = load_scenarios([args.scenario] if args.scenario else [])
+    engine = scenario_engine(args, parser, scenarios[0])
+    months = scenario_months(args, parser, scenarios[0], None)  # <-- None runs until stopped
+    rate = args.rate or None  # <-- 0 runs flat out
+    retention = args.retention
+    if retention not in ('all', 'quarterly', 'annual'):
+        if not retention.isdigit():
+            parser.error(f'--retention: expected a number of months, all, quarterly or annual, not {retention!r}')
+        retention = int(retention)
+    DashboardServer(engine, args.host, args.port, rate, months, retention).run()
+
+
+def add_scenario_arguments(parser):
+    parser.add_argument('--economy', choices=sorted(Engine.DEFAULT_PARAMS), help='default credit')
+    parser.add_argument('--months', type=int, help='default 300 (credit) or 120 (fiat)')
+    parser.add_argument('--surplus', type=float, help='fiat budget_surplus')
+    parser.add_argument('--reserves', type=float, help='credit required_bank_reserves')
+    parser.add_argument('--loan-book', action='store_true', help='credit: amortize loans on a loan book')
+    parser.add_argument('--param', type=parse_param, action='append', default=[], metavar='NAME=VALUE',
+                        help='any other param, may be repeated')
+    parser.add_argument('--minor-units', type=int, metavar='M',
+                        help='exact fixed-point balances in 1/M units, e.g. 100 for cents')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m Python', description='Headless MMT simulator runs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='simulate scenarios and write or print their indicators')
+    run_parser.add_argument('scenarios', nargs='*', help='JSON scenario files')
+    add_scenario_arguments(run_parser)
+    run_parser.add_argument('--check-every', type=int, default=0, metavar='N',
+                            help='check the accounting identities every N months')
+    run_parser.add_argument('--out', help='.parquet, .arrow or .csv file, or a directory')
+    run_parser.set_defaults(handler=run)
+
+    serve_parser = commands.add_parser('serve', help='run one scenario live for many browsers on localhost')
+    serve_parser.add_argument('scenario', nargs='?', help='JSON scenario file')
+    add_scenario_arguments(serve_parser)
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--rate', type=float, default=5, help='months per second, 0 for flat out')
+    serve_parser.add_argument('--retention', default='240',
+                              help="months of history kept for late joiners, or 'all', 'quarterly', 'annual'")
+    serve_parser.set_defaults(handler=serve)
+
+    args = parser.parse_args(argv)
+    args.handler(args, parser)
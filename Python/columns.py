@@ -0,0 +1,91 @@
+import copy
+import numpy as np
+
+class ColumnBuffer:
+    """
+    Growable set of typed NumPy columns with amortized O(1) row appends
+
+    With `size=N` each row of a column is a length-N vector, so a column is
+    a (rows, N) array.
+
+    `fork()` is copy-on-write: the fork shares the arrays with this buffer
+    and whichever side writes first while they are shared copies them.
+    """
+    def __init__(self, dtypes, capacity=256, size=None):
+        self.dtypes = dict(dtypes)
+        self.names = list(self.dtypes)
+        self.shape = () if size is None else (size,)
+        self.length = 0
+        self.capacity = capacity
+        self.arrays = {
+            name: np.zeros((capacity,) + self.shape, dtype=dtype)
+            for name, dtype in self.dtypes.items()
+        }
+        self.owners = [1]  # <-- shared by every buffer holding the same arrays
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, name):
+        return self.arrays[name][:self.length]
+
+    def reserve(self, n):
+        """Make room for at least n rows"""
+        if n <= self.capacity:
+            return
+        capacity = max(n, 2 * self.capacity)
+        for name, col in self.arrays.items():
+            grown = np.zeros((capacity,) + self.shape, dtype=col.dtype)
+            grown[:self.length] = col[:self.length]
+            self.arrays[name] = grown
+        self.capacity = capacity
+        self.release()
+
+    def fork(self):
+        clone = copy.copy(self)
+        clone.arrays = dict(self.arrays)
+        clone.dtypes = dict(self.dtypes)
+        clone.names = list(self.names)
+        self.owners[0] += 1
+        return clone
+
+    def release(self):
+        # the arrays are private now, stop counting as an owner of the shared ones
+        if self.owners[0] > 1:
+            self.owners[0] -= 1
+            self.owners = [1]
+
+    def own(self):
+        """Copy the arrays if they are still shared with a fork"""
+        if self.owners[0] > 1:
+            self.arrays = {name: col.copy() for name, col in self.arrays.items()}
+            self.release()
+
+    def append(self, *values):
+        """Append one row, values given in column order"""
+        if self.length == self.capacity:
+            self.reserve(self.length + 1)
+        self.own()
+        i = self.length
+        for name, value in zip(self.names, values):
+            self.arrays[name][i] = value
+        self.length += 1
+
+    def extend(self, *columns):
+        """Append many rows, one array per column in column order"""
+        n = len(columns[0])
+        self.reserve(self.length + n)
+        self.own()
+        for name, values in zip(self.names, columns):
+            self.arrays[name][self.length:self.length + n] = values
+        self.length += n
+
+    def drop(self, n):
+        """Forget the first n rows, moving the rest to the front"""
+        n = min(n, self.length)
+        if not n:
+            return
+        self.own()
+        for col in self.arrays.values():
+            col[:self.length - n] = col[n:self.length]
+        self.length -= n
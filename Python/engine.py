@@ -0,0 +1,368 @@
+import copy
+from Python.model import Model
+from Python.profiler import Profiler
+from Python.stream import stream
+from math import floor, log
+
+DEFAULT_MONTHS = {'credit': 25*12, 'fiat': 10*12}
+
+class Engine:
+    """
+    Headless simulation engine
+
+    Runs the credit or fiat economy frame by frame with no UI attached.
+    Policy inputs are read from `params` on every frame, so they can be
+    changed between frames. The frames are written in a few element-wise
+    primitives (`where`, `maximum`, ...), so `Ensemble` runs the very same
+    rules over vectors of economies.
+    """
+    DEFAULT_PARAMS = {
+        'credit': {'required_bank_reserves': 50},
+        'fiat': {'budget_surplus': 0}
+    }
+    size = None  # <-- number of economies stepped together, None for a single one
+    check_every = 0  # <-- check the stock-flow identities every N frames, 0 for never
+    tolerance = 1e-9  # <-- allowed residual, relative to the largest balance
+
+    def __init__(self, economy='credit', params=None, minor_units=None, loan_book=False, keep_history=True):
+        if loan_book and economy != 'credit':
+            raise ValueError(f'the loan book is a credit economy mode, not {economy!r}')
+        self.economy = economy
+        self.minor_units = minor_units  # <-- e.g. 100 for exact int64 balances in cents (see Python.ledger), None for float64
+        self.loan_book = loan_book  # <-- amortize each loan on its own schedule (see Python.loanbook), fixed for the run
+        self.keep_history = keep_history  # <-- record month-end balances of every account (see Python.history)
+        self.params = dict(self.DEFAULT_PARAMS[economy])
+        if params is not None:
+            self.params.update(params)
+        self.model = Model(self, self.size)
+        self.economy_init()
+
+    @property
+    def indicators(self):
+        if self.economy == 'credit':
+            return self.model.indicators
+        elif self.economy == 'fiat':
+            return self.model.fiat_indicators
+
+    def frame(self):
+        if self.economy == 'credit':
+            self.credit_econ_frame()
+        elif self.economy == 'fiat':
+            self.fiat_econ_frame()
+        if self.check_every and self.model.month % self.check_every == 0:
+            self.check()
+
+    def check(self):
+        """Raise AccountingError if the ledger breaks a stock-flow identity"""
+        self.model.ledger.check(self.tolerance)
+
+    def fork(self, params=None):
+        """Branch this run at the current month, optionally with different params
+
+        e.g. run 5 years once, then fork one continuation per policy instead
+        of re-simulating the shared prefix for each of them.
+        """
+        clone = copy.copy(self)
+        clone.params = dict(self.params)
+        if params is not None:
+            clone.params.update(params)
+        clone.model = self.model.fork(clone)
+        return clone
+
+    def profile(self, trace_memory=False):
+        """Time frames, phases and operations until the returned Profiler is detached"""
+        return Profiler(trace_memory).attach(self)
+
+    def advance(self, months):
+        """Simulate `months` frames without building the indicator table, e.g. in batch workers"""
+        for i in range(months):
+            self.frame()
+
+    def stream(self, months=None, retention='all', deltas=False):
+        """Simulate month by month, yielding each as a MonthRecord
+
+            for record in engine.stream(1200, retention='annual'):
+                writer.write(record.indicators)
+
+        `months=None` runs until the consumer stops. `retention` ('all', a
+        number of months, 'quarterly' or 'annual', see `stream.Retention`)
+        bounds what the engine keeps meanwhile, and `deltas=True` adds each
+        month's balance changes to the records.
+        """
+        return stream(self, months, retention, deltas)
+
+    def run(self, months):
+        """Simulate `months` frames and return the indicator table"""
+        self.advance(months)
+        return self.indicators.df
+
+    def economy_init(self):
+        if self.economy == 'credit':
+            self.credit_econ_init()
+        elif self.economy == 'fiat':
+            self.fiat_econ_init()
+            
+    def credit_econ_init(self):
+        """Initialize Credit Economy Simulation"""
+        total_money_supply = 100
+        # add bank accounts
+        self.model.balance_sheets['Banks'].add_account('Assets', 'Cash', total_money_supply)
+        self.model.balance_sheets['Banks'].add_account('Equity', 'Bank Reserves', total_money_supply)
+        
+    def fiat_econ_init(self):
+        """Initialize Fiat Economy Simulation"""
+        # add bank accounts
+        self.model.balance_sheets['Treasury'].add_account('Assets', 'Cash', 0)
+        self.model.balance_sheets['Treasury'].add_account('Equity', 'Spending', 0)
+        self.model.balance_sheets['Treasury'].add_account('Equity', 'Taxes', 0)
+        
+    def apply(self, operation, amt):
+        """Post one of the model's operations (see Python.operations)"""
+        self.model.apply(operation, amt)
+
+    def make_loan(self, amt):
+        self.model.apply('make_loan', amt)
+        
+    def invest(self, amt):
+        self.model.apply('invest', amt)
+        
+    def pay_workers(self, amt):
+        self.model.apply('pay_workers', amt)
+        
+    def workers_consume(self, amt):
+        self.model.apply('workers_consume', amt)
+        
+    def capitalists_consume(self, amt):
+        self.model.apply('capitalists_consume', amt)
+        
+    def pay_capitalists(self, amt):
+        self.model.apply('pay_capitalists', amt)
+        
+    def repay_loan(self, amt):
+        self.model.apply('repay_loan', amt)
+        
+    def pay_interest(self, amt):
+        self.model.apply('pay_interest', amt)
+        
+    def default_loan(self, amt):
+        self.model.apply('default_loan', amt)
+        
+    def fiscal_op(self, amt):
+        # spending is booked as a negative amount, taxes as a positive one
+        spend = amt <= 0
+        if self.any(spend):
+            self.model.apply('fiscal_spend', self.where(spend, amt, 0))
+        tax = amt > 0
+        if self.any(tax):
+            self.model.apply('fiscal_tax', self.where(tax, amt, 0))
+
+    # element-wise primitives the frames are written in: plain Python for a
+    # single economy, overridden with their NumPy versions by Ensemble
+    @staticmethod
+    def where(cond, a, b):
+        return a if cond else b
+
+    maximum = staticmethod(max)
+    minimum = staticmethod(min)
+    floor = staticmethod(floor)
+    any = staticmethod(bool)
+    log = staticmethod(log)
+
+    def param(self, name):
+        return self.params[name]
+
+    def propensities(self):
+        """This month's (workers, capitalists) propensities to consume"""
+        return 0.9, 0.4
+
+    def defaults(self):
+        """Loan defaults for this month; none in the deterministic model"""
+
+        
+    @staticmethod
+    def loan_payment(principal, annual_r, years):
+        n = years * 12  # number of monthly payments
+        r = (annual_r / 100) / 12  # decimal monthly interest rate from APR
+        pmt = (r * principal * ((1+r) ** n)) / (((1+r) ** n) - 1)
+        return pmt
+        
+    def cpi_growth(self, unemp, full_emp_counter):
+        """full_emp_counter will accelerate inflation the longer the economy stays in full employment
+        minimum is zero
+        """
+        adj_unemp = self.where(
+            full_emp_counter > 0,
+            0.01 * 10.0**-full_emp_counter,
+            self.maximum(0.01, unemp)
+        )
+        logit_func = self.log(adj_unemp / (1 - adj_unemp))
+        annualized_growth = -logit_func / (100)
+        monthly_change = (annualized_growth / 12)
+        return monthly_change
+    
+    @staticmethod
+    def cpi(current_cpi, cpi_growth):
+        return current_cpi * (1 + cpi_growth)
+
+    def labour_market(self, idle_workers):
+        """Set this month's idle workers; updates the CPI and returns the unemployment rate"""
+        model = self.model
+        model.idle_workers = idle_workers
+        model.full_employment_counter = self.where(
+            idle_workers == 0,
+            model.full_employment_counter + 1,
+            self.maximum(model.full_employment_counter - 1, 0)
+        )
+        unemp = self.minimum(0.99, idle_workers / model.worker_pool)
+        price_inflation = self.cpi_growth(unemp, model.full_employment_counter)
+        model.current_cpi = self.cpi(model.current_cpi, price_inflation)
+        return unemp
+
+    def fiat_row(self, gdp, unemp, payroll, new_businesses, deflator, wage_deflator):
+        """The month's fiat indicators, before the trailing windows are filled in"""
+        return {
+            'Nom GDP': gdp,
+            'Real GDP': gdp * deflator,
+            'Unemployment': unemp,
+            'Nom Wages': payroll,
+            'Real Wages': payroll * wage_deflator,
+            'TTM Real Wages': self.model.fiat_trailing.window('Real Wages').preview(payroll * deflator),
+            'New Business Formation': new_businesses,
+            'CPI': self.model.current_cpi
+        }
+    
+    def fiat_econ_frame(self):
+        model = self.model
+        model.next_month()
+        balance_sheets = model.balance_sheets
+        deflator = 1 / (model.current_cpi / model.starting_cpi)
+        wage_deflator = 1 / (model.current_worker_wage / model.starting_worker_wage) # <-- wages inflate half as fast as prices
+        w_propensity, k_propensity = self.propensities()
+        # check govt surplus
+        govt_surplus = self.param('budget_surplus') / 12.0
+        govt_spending = self.maximum(-govt_surplus, 0)
+        
+        # spend or tax capitalists
+        self.fiscal_op(govt_surplus)
+        
+        # invest if possible
+        capitalists_cash = balance_sheets['Capitalists'].get(('Assets', 'Cash'))
+        capitalists_reserve = 3
+        nom_startup_capital = model.real_startup_cap / deflator
+        spare_cash = capitalists_cash - capitalists_reserve
+        founding = spare_cash > nom_startup_capital
+        new_businesses = self.where(founding, self.floor(spare_cash / nom_startup_capital), 0) # <-- addition to business formation
+        i = nom_startup_capital * new_businesses # <-- addition to GDP
+        if self.any(founding):
+            self.invest(i)
+            
+        # firms hire workers
+        firm_cash = balance_sheets['Firms'].get(('Assets', 'Cash'))
+        workers_needed = self.where(new_businesses == 0, -1, new_businesses * 3)
+        unemp = self.labour_market(self.minimum(model.worker_pool, self.maximum(0, model.idle_workers - workers_needed)))
+        
+        # firms pay workers
+        payroll = model.current_worker_wage * (model.worker_pool - model.idle_workers)
+        self.pay_workers(payroll)
+        
+        # capitalists consume once they own firms
+        owners = balance_sheets['Capitalists'].get(('Assets', 'Investments')) > 0
+        k_consumption = self.maximum(0, k_propensity * spare_cash)
+        if self.any(owners):
+            self.capitalists_consume(self.where(owners, k_consumption, 0))
+            
+        # workers consume
+        worker_cash = balance_sheets['Workers'].get(('Assets', 'Cash'))
+        w_consumption = w_propensity * worker_cash
+        if self.any(owners):
+            self.workers_consume(self.where(owners, w_consumption, 0))
+        
+        # firms pay capitalists
+        earnings = 0.1 * firm_cash
+        self.pay_capitalists(earnings)
+        
+        # append to indicators, trailing windows are filled in by fiat_trailing
+        gdp = w_consumption + k_consumption + i + govt_spending
+        row = self.fiat_row(gdp, unemp, payroll, new_businesses, deflator, wage_deflator)
+        model.fiat_indicators.append_row(model.fiat_trailing.update(row))
+        
+    def credit_econ_frame(self):
+        self.model.next_month()
+        balance_sheets = self.model.balance_sheets
+        w_propensity, k_propensity = self.propensities()
+    
+        # make a loan if possible
+        required_bank_reserves = self.param('required_bank_reserves')
+        current_bank_reserves = balance_sheets['Banks'].get(('Equity', 'Bank Reserves'))
+        lending_amt = 5
+        interest_rate = 0.04
+        lends = current_bank_reserves >= lending_amt + required_bank_reserves
+        if self.any(lends):
+            lending = self.where(lends, lending_amt, 0)
+            self.make_loan(lending)
+            if self.loan_book:
+                # with an ensemble, one vintage for the month, zero in the economies that didn't lend
+                self.model.loans.originate(lending, interest_rate, 5 * 12, self.model.month)
+            
+        # invest in a firm if possible
+        required_startup_capital = 2.5
+        capitalists_cash = balance_sheets['Capitalists'].get(('Assets', 'Cash'))
+        capitalists_reserve = 10
+        spare_cash = capitalists_cash - capitalists_reserve
+        founding = spare_cash > required_startup_capital
+        new_businesses = self.where(founding, self.floor(spare_cash / required_startup_capital), 0) # <-- addition to business formation
+        i = required_startup_capital * new_businesses  # <-- addition to GDP
+        if self.any(founding):
+            self.invest(i)
+            
+        # firms pay workers
+        firm_cash = balance_sheets['Firms'].get(('Assets', 'Cash'))
+        payroll = 0.6 * firm_cash
+        self.pay_workers(payroll)
+            
+        # workers consume
+        worker_cash = balance_sheets['Workers'].get(('Assets', 'Cash'))
+        w_consumption = w_propensity * worker_cash
+        self.workers_consume(w_consumption)
+        
+        # capitalists consume
+        k_consumption = self.maximum(0, k_propensity * spare_cash)
+        self.capitalists_consume(k_consumption)
+            
+        # firms pay capitalists
+        earnings = 0.1 * firm_cash
+        self.pay_capitalists(earnings)
+            
+        # capitalists repay loans
+        if self.loan_book:
+            # every loan on its own schedule, interest and principal booked separately
+            interest, principal = self.model.loans.due()
+            interest_due = interest.sum(axis=0)
+            principal_due = principal.sum(axis=0)
+            paid = capitalists_cash >= interest_due + principal_due
+            if self.any(paid):
+                self.pay_interest(self.where(paid, interest_due, 0))
+                self.repay_loan(self.where(paid, principal_due, 0))
+                self.model.loans.pay(principal, paid)
+        else:
+            loan_balance = balance_sheets['Capitalists'].get(('Liabilities', 'Capitalists Loans'))
+            pmt = self.loan_payment(loan_balance, interest_rate, 5)
+            repays = capitalists_cash >= pmt
+            if self.any(repays):
+                self.repay_loan(self.where(repays, pmt, 0))
+        self.defaults()
+        
+        # calculate econ indicators
+        gdp = w_consumption + k_consumption + i
+        money_supply = 100 - balance_sheets['Banks'].get(('Equity', 'Bank Reserves'))
+        
+        # append to indicators, trailing windows are filled in by trailing
+        row = {
+            'GDP': gdp,
+            'Money Supply': money_supply,
+            'Worker Incomes': payroll,
+            'Capitalist Incomes': earnings,
+            'Firm Incomes': w_consumption + k_consumption,
+            'New Business Formation': new_businesses
+        }
+        self.model.indicators.append_row(self.model.trailing.update(row))
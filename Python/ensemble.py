@@ -0,0 +1,35 @@
+import numpy as np
+from Python.engine import Engine
+
+class Ensemble(Engine):
+    """
+    Steps `size` independent economies at once
+
+    Every account of every actor is a NumPy vector over the economies and
+    the frame rules are applied element-wise, so one month costs about the
+    same whatever the ensemble size. Params may be scalars or length-`size`
+    arrays, e.g. Ensemble('fiat', 201, {'budget_surplus': np.arange(-100, 101)}).
+    Account history is off unless `keep_history`: a changed account costs
+    `size` values a month.
+    """
+    def __init__(self, economy='credit', size=1000, params=None, minor_units=None, loan_book=False,
+                 keep_history=False):
+        self.size = size
+        super().__init__(economy, params, minor_units, loan_book, keep_history)
+
+    def run(self, months):
+        """Simulate `months` frames; `indicators[col]` is a (months + 1, size) array"""
+        for i in range(months):
+            self.frame()
+        return self.indicators
+
+    def param(self, name):
+        return np.broadcast_to(np.asarray(self.params[name], dtype=float), (self.size,))
+
+    # the frame primitives, element-wise over the economies
+    where = staticmethod(np.where)
+    maximum = staticmethod(np.maximum)
+    minimum = staticmethod(np.minimum)
+    floor = staticmethod(np.floor)
+    any = staticmethod(np.any)
+    log = staticmethod(np.log)
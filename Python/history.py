@@ -0,0 +1,145 @@
+import numpy as np
+from Python.balancesheet import BalanceSheet
+from Python.columns import ColumnBuffer
+
+class History:
+    """
+    Month-end balance of every account of a ledger, change-encoded
+
+    Closing a month compares the ledger with the previous close and stores
+    only the cells that changed, with their new balance, so memory grows
+    with the number of changes and not with months x accounts. An account's
+    path or a month's full sheets are rebuilt on demand by carrying each
+    stored balance forward. The current month is read straight from the
+    ledger. `forget` folds the oldest months into one to bound memory.
+    """
+    def __init__(self, ledger):
+        self.ledger = ledger
+        self.month = 0  # <-- next month to close
+        self.first = 0  # <-- earliest month still recorded
+        self.stride = ledger.balances.shape[1]  # <-- ledger columns the cell indices are laid out for
+        self.starts = ColumnBuffer([('start', np.int64)])  # <-- first change of each closed month
+        self.cells = ColumnBuffer([('cell', np.int64)])  # <-- flat ledger index of each change
+        self.balances = ColumnBuffer([('balance', ledger.balances.dtype)], size=ledger.size)  # <-- as the ledger holds them
+        self.previous = np.zeros_like(ledger.flat)
+
+    def fork(self, ledger):
+        """Copy following `ledger`, sharing the history recorded so far until either side closes a month"""
+        clone = History.__new__(History)
+        clone.ledger = ledger
+        clone.month = self.month
+        clone.first = self.first
+        clone.stride = self.stride
+        clone.starts = self.starts.fork()
+        clone.cells = self.cells.fork()
+        clone.balances = self.balances.fork()
+        clone.previous = self.previous.copy()
+        return clone
+
+    def restride(self):
+        # the ledger opened more columns, so every flat index moves
+        stride = self.ledger.balances.shape[1]
+        self.cells.own()
+        cells = self.cells['cell']
+        cells[:] = cells // self.stride * stride + cells % self.stride
+        previous = np.zeros_like(self.ledger.flat)
+        rows = np.arange(len(self.ledger.actors))[:, np.newaxis]
+        previous[(rows * stride + np.arange(self.stride)).reshape(-1)] = self.previous
+        self.previous = previous
+        self.stride = stride
+
+    def close(self):
+        """Record the ledger as it stands as the end of month `self.month`"""
+        if self.stride != self.ledger.balances.shape[1]:
+            self.restride()
+        flat = self.ledger.flat
+        changed = flat != self.previous
+        if changed.ndim > 1:
+            changed = changed.any(axis=1)  # <-- a cell changed if it did in any economy
+        cells = np.flatnonzero(changed)
+        self.starts.append(len(self.cells))
+        if len(cells):
+            self.cells.extend(cells)
+            self.balances.extend(flat[cells])
+        np.copyto(self.previous, flat)
+        self.month += 1
+
+    def forget(self, month):
+        """Keep the month-end state from `month` on, folding the earlier changes into that of `month`"""
+        month = min(month, self.month - 1)
+        if month <= self.first:
+            return
+        if self.stride != self.ledger.balances.shape[1]:
+            self.restride()
+        base = self._state(month)
+        changed = base != 0
+        if changed.ndim > 1:
+            changed = changed.any(axis=1)
+        cells = np.flatnonzero(changed)
+        later = self.starts['start'][month + 1 - self.first:]
+        offset = later[0] if len(later) else len(self.cells)
+        starts = ColumnBuffer([('start', np.int64)], max(len(later) + 1, 1))
+        starts.extend(np.concatenate([[0], later - offset + len(cells)]))
+        kept = ColumnBuffer([('cell', np.int64)], max(len(self.cells) - offset + len(cells), 1))
+        kept.extend(np.concatenate([cells, self.cells['cell'][offset:]]))
+        balances = ColumnBuffer([('balance', self.balances.dtypes['balance'])], len(kept), self.ledger.size)
+        balances.extend(np.concatenate([base[cells], self.balances['balance'][offset:]]))
+        self.starts, self.cells, self.balances = starts, kept, balances
+        self.first = month
+
+    def series(self, actor, account):
+        """Month-end balances of one account, months `first` to the current one"""
+        shape = (self.month - self.first + 1,) + self.ledger.shape
+        col = self.ledger.columns.get(account)
+        if col is None:
+            return np.zeros(shape)
+        if self.stride != self.ledger.balances.shape[1]:
+            self.restride()
+        row = self.ledger.rows[actor]
+        changes = np.flatnonzero(self.cells['cell'] == row * self.stride + col)
+        months = np.searchsorted(self.starts['start'], changes, side='right') - 1
+        # position of the latest change at or before each month, -1 before the first
+        latest = np.full(self.month - self.first, -1)
+        latest[months] = np.arange(len(changes))
+        np.maximum.accumulate(latest, out=latest)
+        out = np.zeros(shape)
+        known = latest >= 0
+        out[:-1][known] = self.ledger.money(self.balances['balance'][changes[latest[known]]])
+        out[-1] = self.ledger.money(self.ledger.balances[row, col])
+        return out
+
+    def state(self, month):
+        """(actors x accounts) balances at the end of `month`"""
+        if month >= self.month:
+            return self.ledger.money(self.ledger.balances.copy())
+        if month < self.first:
+            raise ValueError(f'month {month} was forgotten, the history starts at month {self.first}')
+        if self.stride != self.ledger.balances.shape[1]:
+            self.restride()
+        return self.ledger.money(self._state(month).reshape(self.ledger.balances.shape))
+
+    def _state(self, month):
+        # flat ledger as it stood at the end of closed month `month`, as held in the ledger
+        n = self.starts['start'][month + 1 - self.first] if month + 1 < self.month else len(self.cells)
+        cells = self.cells['cell'][:n]
+        # keep the last change of every cell
+        unique, first = np.unique(cells[::-1], return_index=True)
+        last = n - 1 - first
+        state = np.zeros_like(self.ledger.flat)
+        state[cells[last]] = self.balances['balance'][last]
+        return state
+
+    def sheets(self, month, balance_sheets):
+        """Stand-alone copies of `balance_sheets` as they stood at the end of `month`"""
+        state = self.state(month)
+        sheets = {}
+        for actor, live in balance_sheets.items():
+            bs = sheets[actor] = BalanceSheet(actor, size=self.ledger.size)
+            for account in live.accounts:
+                bs.add_account(account[0], account[1], state[live.row, live.slots[account]])
+        return sheets
+
+    def df(self, accounts):
+        """Month-end balances of (actor, account) pairs, one column each (single runs only)"""
+        import pandas as pd
+        return pd.DataFrame({(actor,) + account: self.series(actor, account) for actor, account in accounts})
@@ -0,0 +1,129 @@
+import numpy as np
+from Python.columns import ColumnBuffer
+
+class IndicatorStore(ColumnBuffer):
+    """
+    Month-by-month history of economic indicators
+
+    One preallocated float64 array per indicator, grown geometrically, so
+    appending a month is amortized O(1). `store[col]` and `df` are views on
+    the filled part of the arrays, not copies. A row with a new indicator
+    adds a column, back-filled with NaN.
+
+    Rows are months 0, 1, 2, ... until `retain` drops some, e.g. to bound
+    memory on long streamed runs (see `Python.stream`); from then on
+    `index` holds the month of each row.
+    """
+    def __init__(self, initial, size=None, capacity=256):
+        super().__init__([(col, np.float64) for col in initial], capacity, size)
+        self._df = None
+        self.months = None  # <-- ColumnBuffer of row months once rows were dropped
+        self.append_row(initial)
+
+    @property
+    def columns(self):
+        return self.names
+
+    @property
+    def index(self):
+        """Month of every row"""
+        if self.months is None:
+            return np.arange(self.length)
+        return self.months['month']
+
+    def append_row(self, row):
+        """Append one month given as {indicator: value}"""
+        if self.length == self.capacity:
+            self.reserve(self.length + 1)
+        self.own()
+        i = self.length
+        for col, value in row.items():
+            if col not in self.arrays:
+                self.add_column(col)
+            self.arrays[col][i] = value
+        self.length += 1
+        if self.months is not None:
+            self.months.append(self.months['month'][-1] + 1 if i else 0)
+        self._df = None
+
+    def fork(self):
+        clone = super().fork()
+        clone._df = None
+        if self.months is not None:
+            clone.months = self.months.fork()
+        return clone
+
+    def retain(self, keep):
+        """Keep only the rows where the boolean mask `keep` is set"""
+        keep = np.asarray(keep, dtype=bool)
+        if keep.all():
+            return
+        if self.months is None:
+            self.months = ColumnBuffer([('month', np.int64)], self.capacity)
+            self.months.extend(np.arange(self.length))
+        first = int(np.argmin(keep))  # <-- rows before the first dropped one stay where they are
+        n = first + int(keep[first:].sum())
+        self.own()
+        self.months.own()
+        for col in list(self.arrays.values()) + [self.months.arrays['month']]:
+            col[first:n] = col[first:self.length][keep[first:]]
+        self.length = self.months.length = n
+        self._df = None
+
+    def add_column(self, col):
+        self.arrays[col] = np.full((self.capacity,) + self.shape, np.nan)
+        self.dtypes[col] = np.float64
+        self.names.append(col)
+        self._df = None
+
+    def last(self):
+        """Most recent month as {indicator: value}"""
+        return {col: self.arrays[col][self.length - 1].copy() for col in self.names}
+
+    @property
+    def values(self):
+        return np.stack([self[col] for col in self.names], axis=-1)
+
+    @property
+    def df(self):
+        if self._df is None:
+            import pandas as pd
+            index = None if self.months is None else pd.Index(self.index, name='month')
+            self._df = pd.DataFrame({col: self[col] for col in self.names}, index=index, copy=False)
+        return self._df
+
+    def to_arrow(self):
+        """Arrow table; an ensemble is stored long, one row per (month, economy)"""
+        import pyarrow as pa
+        if not self.shape:
+            return pa.table({col: self[col] for col in self.names})
+        size = self.shape[0]
+        columns = {
+            'month': np.repeat(self.index.astype(np.int32), size),
+            'economy': np.tile(np.arange(size, dtype=np.int32), self.length)
+        }
+        columns.update({col: self[col].reshape(-1) for col in self.names})
+        return pa.table(columns)
+
+    @classmethod
+    def from_arrow(cls, table):
+        """Inverse of `to_arrow`"""
+        names = [col for col in table.column_names if col not in ('month', 'economy')]
+        if 'economy' in table.column_names:
+            size = int(table.column('economy').to_numpy().max()) + 1
+        else:
+            size = None
+        shape = (-1,) if size is None else (-1, size)
+        columns = {col: table.column(col).to_numpy().reshape(shape) for col in names}
+        n = len(next(iter(columns.values()))) if columns else 0
+        store = cls({col: values[0] for col, values in columns.items()}, size, capacity=max(n, 1))
+        for col, values in columns.items():
+            store.arrays[col][:n] = values
+        store.length = n
+        if 'month' in table.column_names:
+            months = table.column('month').to_numpy()
+            months = months if size is None else months[::size]
+            if not np.array_equal(months, np.arange(n)):
+                store.months = ColumnBuffer([('month', np.int64)], max(n, 1))
+                store.months.extend(months)
+        return store
@@ -0,0 +1,174 @@
+import copy
+import numpy as np
+from Python.balancesheet import BalanceSheet
+from Python.columns import ColumnBuffer
+
+class Journal:
+    """
+    Append-only record of every flow posted to the balance sheets
+
+    Each entry is a (month, actor, account_in, account_out, amount) row with
+    actors and accounts stored as integer codes. Opening balances from
+    `BalanceSheet.add_account` are recorded with account_out = -1.
+    A snapshot of every sheet is taken every `snapshot_interval` months, so
+    any month can be rebuilt by replaying only the entries since the nearest
+    snapshot. `forget` drops what came before a snapshot to bound memory.
+    """
+    OPENING = -1
+
+    def __init__(self, snapshot_interval=12):
+        self.snapshot_interval = snapshot_interval
+        self.month = 0
+        self.actors = []
+        self.actor_codes = {}
+        self.accounts = []
+        self.account_codes = {}
+        self.entries = ColumnBuffer([
+            ('month', np.int32),
+            ('actor', np.int16),
+            ('account_in', np.int32),
+            ('account_out', np.int32),
+            ('amount', np.float64)
+        ])
+        self.snapshots = {}  # <-- month -> {actor: (accounts, balances)}
+        self.first = 0  # <-- earliest month that can still be rebuilt
+
+    def fork(self):
+        """Copy that shares the entries written so far until either side appends"""
+        clone = copy.copy(self)
+        clone.actors = list(self.actors)
+        clone.actor_codes = dict(self.actor_codes)
+        clone.accounts = list(self.accounts)
+        clone.account_codes = dict(self.account_codes)
+        clone.entries = self.entries.fork()
+        clone.snapshots = dict(self.snapshots)  # <-- snapshots are never modified, so share them
+        return clone
+
+    def __len__(self):
+        return len(self.entries)
+
+    def actor_code(self, actor):
+        if actor not in self.actor_codes:
+            self.actor_codes[actor] = len(self.actors)
+            self.actors.append(actor)
+        return self.actor_codes[actor]
+
+    def account_code(self, account):
+        if account not in self.account_codes:
+            self.account_codes[account] = len(self.accounts)
+            self.accounts.append(account)
+        return self.account_codes[account]
+
+    def record(self, actor, account_in, account_out, amount):
+        """Append one entry; actor and accounts are codes"""
+        self.entries.append(self.month, actor, account_in, account_out, amount)
+
+    def next_month(self, balance_sheets):
+        """Close the current month, taking a snapshot if one is due"""
+        if self.month % self.snapshot_interval == 0:
+            self.snapshot(balance_sheets)
+        self.month += 1
+
+    def snapshot(self, balance_sheets):
+        self.snapshots[self.month] = {
+            actor: (list(bs.accounts), bs.values())
+            for actor, bs in balance_sheets.items()
+        }
+
+    def replay(self, month):
+        """Rebuild every actor's balance sheet as it stood at the end of `month`"""
+        if month < self.first:
+            raise ValueError(f'month {month} was forgotten, the journal starts at month {self.first}')
+        earlier = [m for m in self.snapshots if m <= month]
+        balance_sheets = {}
+        if earlier:
+            start = max(earlier)
+            for actor, (accounts, balances) in self.snapshots[start].items():
+                bs = balance_sheets[actor] = BalanceSheet(actor)
+                for account, balance in zip(accounts, balances):
+                    bs.add_account(account[0], account[1], balance)
+        else:
+            start = -1
+        for actor in self.actors:
+            if actor not in balance_sheets:
+                balance_sheets[actor] = BalanceSheet(actor)
+
+        # replay everything after the snapshot, up to and including `month`
+        months = self.entries['month']
+        lo = np.searchsorted(months, start, side='right')
+        hi = np.searchsorted(months, month, side='right')
+        actors = self.entries['actor'][lo:hi]
+        accounts_in = self.entries['account_in'][lo:hi]
+        accounts_out = self.entries['account_out'][lo:hi]
+        amounts = self.entries['amount'][lo:hi]
+        for actor, a_in, a_out, amount in zip(actors, accounts_in, accounts_out, amounts):
+            bs = balance_sheets[self.actors[actor]]
+            account_in = self.accounts[a_in]
+            if a_out == self.OPENING:
+                bs.add_account(account_in[0], account_in[1], amount)
+            else:
+                bs.add_flow(account_in, self.accounts[a_out], amount)
+        return balance_sheets
+
+    def history(self):
+        """Every account's balance at the end of every month, in one pass
+
+        Returns the (actor, account) cells that were ever posted to and a
+        (months + 1, cells) array whose row m is the state after month m,
+        i.e. what `replay(m)` would rebuild for each of them. Once entries
+        were forgotten, row 0 is month `first` instead.
+        """
+        months = self.entries['month'] - self.first
+        actors = self.entries['actor'].astype(np.intp)
+        accounts_in = self.entries['account_in'].astype(np.intp)
+        accounts_out = self.entries['account_out'].astype(np.intp)
+        amounts = self.entries['amount']
+
+        # the out leg follows add_flow's sign rule; openings have no out leg
+        assets = np.array([account[0] == 'Assets' for account in self.accounts] + [False])  # <-- OPENING (-1) is last
+        flows = accounts_out != self.OPENING
+        sign = np.where(assets[accounts_in] != assets[accounts_out], 1.0, -1.0)
+        width = len(self.accounts)
+        keys = np.concatenate([actors * width + accounts_in, (actors * width + accounts_out)[flows]])
+        deltas = np.concatenate([amounts, (sign * amounts)[flows]])
+        rows = np.concatenate([months, months[flows]])
+        if self.first:
+            # start from the snapshot the forgotten entries were folded into
+            snapshot = [
+                (self.actor_codes[actor] * width + self.account_codes[account], balance)
+                for actor, (accounts, balances) in self.snapshots[self.first].items()
+                for account, balance in zip(accounts, balances)
+            ]
+            keys = np.concatenate([keys, np.array([key for key, balance in snapshot], dtype=np.intp)])
+            deltas = np.concatenate([deltas, [balance for key, balance in snapshot]])
+            rows = np.concatenate([rows, np.zeros(len(snapshot), dtype=rows.dtype)])
+
+        cells, columns = np.unique(keys, return_inverse=True)
+        last = max(self.month - self.first, int(months[-1]) if len(months) else 0)
+        balances = np.zeros((last + 1, len(cells)))
+        np.add.at(balances, (rows, columns), deltas)
+        np.cumsum(balances, axis=0, out=balances)
+        return [(self.actors[key // width], self.accounts[key % width]) for key in cells], balances
+
+    def forget(self, month):
+        """Drop the entries and snapshots before the latest snapshot at or before `month`"""
+        earlier = [m for m in self.snapshots if m <= month]
+        if not earlier or max(earlier) <= self.first:
+            return
+        self.first = max(earlier)
+        self.snapshots = {m: s for m, s in self.snapshots.items() if m >= self.first}
+        self.entries.drop(np.searchsorted(self.entries['month'], self.first, side='right'))
+
+    @property
+    def df(self):
+        import pandas as pd
+        accounts = self.accounts + [None]  # <-- OPENING (-1) decodes to None
+        return pd.DataFrame(
+            data={
+                'month': self.entries['month'],
+                'actor': [self.actors[i] for i in self.entries['actor']],
+                'account_in': [accounts[i] for i in self.entries['account_in']],
+                'account_out': [accounts[i] for i in self.entries['account_out']],
+                'amount': self.entries['amount']
+            }
+        )
@@ -0,0 +1,148 @@
+import numpy as np
+
+class AccountingError(ArithmeticError):
+    """Raised when the ledger breaks a stock-flow identity"""
+
+
+class Ledger:
+    """
+    Balances of every actor's accounts in one (actors x accounts) matrix
+
+    Columns form the economy's chart of accounts: one per (type, name)
+    account, shared by all actors and opened on first use. Per-type totals
+    are kept alongside in an (actors x 3) matrix. With `size=N` each cell is
+    a length-N vector over independent economies.
+
+    `check()` verifies in a few vectorized operations that every sheet
+    balances, that the totals match the balances, and that each registered
+    identity (linear combinations of cells that must net to zero, e.g. bank
+    deposits against the depositors' cash) holds.
+
+    With `minor_units=M` money is fixed point: balances are int64 counts of
+    1/M of a unit (M=100 for cents), every amount posted is rounded to the
+    nearest minor unit, ties to even, and all the legs of a posting move by
+    that same integer, so sheets and identities balance exactly. `units()`
+    and `money()` convert between amounts and what the matrices hold.
+    """
+    TYPES = {'Assets': 0, 'Liabilities': 1, 'Equity': 2}
+
+    def __init__(self, actors, size=None, minor_units=None):
+        self.size = size
+        self.shape = () if size is None else (size,)
+        self.minor_units = minor_units  # <-- None for float64 balances
+        dtype = float if minor_units is None else np.int64
+        self.actors = list(actors)
+        self.rows = {actor: i for i, actor in enumerate(self.actors)}
+        self.accounts = []
+        self.columns = {}  # <-- (type, name) -> column
+        self.types = np.zeros(8, dtype=np.int8)
+        self.balances = np.zeros((len(self.actors), 8) + self.shape, dtype=dtype)
+        self.totals = np.zeros((len(self.actors), len(self.TYPES)) + self.shape, dtype=dtype)
+        self.identities = {}  # <-- name -> (rows, columns, coefficients)
+        self._checks = None  # <-- check matrices, rebuilt when accounts or identities are added
+        self.reshape()
+
+    def reshape(self):
+        # (actors * columns) x economies views, so a set of cells is one flat index
+        self.flat = self.balances.reshape((-1,) + self.shape)
+        self.flat_totals = self.totals.reshape((-1,) + self.shape)
+
+    def units(self, amount):
+        """`amount` as held in the matrices: rounded to int64 minor units, or as is for a float ledger"""
+        if self.minor_units is None:
+            return amount
+        return np.rint(np.multiply(amount, self.minor_units)).astype(np.int64)
+
+    def money(self, units):
+        """Inverse of `units`: balances read from the matrices as amounts of money"""
+        if self.minor_units is None:
+            return units
+        return units / self.minor_units
+
+    def column(self, account):
+        """Return the column of an account, adding it to the chart of accounts if needed"""
+        try:
+            return self.columns[account]
+        except KeyError:
+            pass
+        col = len(self.accounts)
+        if col == len(self.types):
+            # grow geometrically so opening accounts stays cheap
+            self.balances = np.concatenate([self.balances, np.zeros_like(self.balances)], axis=1)
+            self.types = np.concatenate([self.types, np.zeros(col, dtype=np.int8)])
+            self.reshape()
+        self.types[col] = self.TYPES[account[0]]
+        self.accounts.append(account)
+        self.columns[account] = col
+        self._checks = None
+        return col
+
+    def add_identity(self, name, terms):
+        """Require the (actor, account, coefficient) terms to sum to zero
+
+        Returns False, and adds nothing, if an actor isn't in this ledger.
+        """
+        if any(actor not in self.rows for actor, account, coef in terms):
+            return False
+        rows = np.array([self.rows[actor] for actor, account, coef in terms], dtype=np.intp)
+        cols = np.array([self.column(account) for actor, account, coef in terms], dtype=np.intp)
+        coefs = np.array([coef for actor, account, coef in terms], dtype=float)
+        self.identities[name] = (rows, cols, coefs)
+        self._checks = None
+        return True
+
+    def residuals(self):
+        """Every checked quantity that should be zero, by name"""
+        balance, drift, identities = (self.money(r) for r in self._residuals())
+        residuals = {'balance ' + actor: r for actor, r in zip(self.actors, balance)}
+        for t, type in enumerate(self.TYPES):
+            residuals.update({f'{type} total {actor}': r for actor, r in zip(self.actors, drift[:, t])})
+        residuals.update(zip(self.identities, identities))
+        return residuals
+
+    def _residuals(self):
+        if self._checks is None:
+            stride = self.balances.shape[1]
+            identities = np.zeros((len(self.identities), len(self.flat)))
+            for i, (rows, cols, coefs) in enumerate(self.identities.values()):
+                np.add.at(identities[i], rows * stride + cols, coefs)
+            by_type = np.eye(len(self.TYPES))[self.types].T
+            if self.minor_units is not None:
+                # integer coefficients keep the exact residuals exact
+                identities = np.rint(identities).astype(np.int64)
+                by_type = by_type.astype(np.int64)
+            self._checks = (identities, by_type)
+        identities, by_type = self._checks
+        totals = self.totals
+        # assets = liabilities + equity on every sheet
+        balance = totals[:, 0] - totals[:, 1] - totals[:, 2]
+        # incrementally kept totals against the balances they sum
+        balances = self.balances.reshape(self.balances.shape[:2] + (-1,))  # <-- economies last, even if there's one
+        drift = np.matmul(by_type, balances).reshape(totals.shape) - totals
+        return balance, drift, identities @ self.flat
+
+    def check(self, tolerance=1e-9):
+        """Raise AccountingError if any residual exceeds `tolerance` times the largest balance
+
+        A fixed-point ledger must balance exactly, whatever the tolerance.
+        """
+        if self.minor_units is None:
+            limit = tolerance * (1 + np.abs(self.flat).max())
+        else:
+            limit = 0
+        if max(np.abs(r).max(initial=0) for r in self._residuals()) <= limit:
+            return
+        failed = {name: r for name, r in self.residuals().items() if np.any(np.abs(r) > self.money(limit))}
+        worst = ', '.join(f'{name}: {np.abs(r).max():.6g}' for name, r in failed.items())
+        raise AccountingError(f'stock-flow identities broken ({worst})')
+
+    def copy(self):
+        clone = Ledger(self.actors, self.size, self.minor_units)
+        clone.accounts = list(self.accounts)
+        clone.columns = dict(self.columns)
+        clone.types = self.types.copy()
+        clone.balances = self.balances.copy()
+        clone.totals = self.totals.copy()
+        clone.identities = dict(self.identities)
+        clone.reshape()
+        return clone
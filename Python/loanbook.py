@@ -0,0 +1,98 @@
+import numpy as np
+from Python.columns import ColumnBuffer
+
+class LoanBook:
+    """
+    Outstanding loans, one row per loan, as parallel NumPy columns
+
+    Every loan is a fixed-payment annuity: its monthly payment is fixed at
+    origination from an annuity factor cached per (rate, term), and each
+    month `due()` splits the payments of the whole book into interest and
+    principal in one vectorized pass. Rates are annual percentages, as in
+    `Engine.loan_payment`.
+
+    With `size=N` a loan is a vintage across N economies: principal,
+    balance and payment are length-N vectors, zero where an economy didn't
+    lend that month.
+    """
+    def __init__(self, size=None, capacity=64):
+        self.size = size
+        self.terms = ColumnBuffer([
+            ('rate', np.float64),
+            ('term', np.int32),
+            ('originated', np.int32)
+        ], capacity)
+        self.amounts = ColumnBuffer([
+            ('principal', np.float64),
+            ('balance', np.float64),
+            ('payment', np.float64)
+        ], capacity, size)
+        self.factors = {}  # <-- (rate, term) -> payment per unit of principal
+
+    def __len__(self):
+        return len(self.terms)
+
+    def fork(self):
+        clone = LoanBook.__new__(LoanBook)
+        clone.size = self.size
+        clone.terms = self.terms.fork()
+        clone.amounts = self.amounts.fork()
+        clone.factors = self.factors  # <-- only ever added to, and the same for every branch
+        return clone
+
+    def annuity_factor(self, rate, term):
+        """Monthly payment per unit of principal of a `term`-month loan at `rate`% APR"""
+        key = (rate, term)
+        if key not in self.factors:
+            r = (rate / 100) / 12
+            self.factors[key] = 1 / term if r == 0 else r * (1 + r)**term / ((1 + r)**term - 1)
+        return self.factors[key]
+
+    def originate(self, principal, rate, term, month):
+        """Add a loan of `principal` at `rate`% APR repaid over `term` months"""
+        self.terms.append(rate, term, month)
+        self.amounts.append(principal, principal, principal * self.annuity_factor(rate, term))
+
+    def due(self):
+        """This month's (interest, principal) of every loan, each shaped like the balances"""
+        balance = self.amounts['balance']
+        monthly = self.terms['rate'] / 1200
+        if self.size is not None:
+            monthly = monthly[:, np.newaxis]
+        interest = balance * monthly
+        principal = np.minimum(self.amounts['payment'] - interest, balance)
+        return interest, principal
+
+    def pay(self, principal, paid=True):
+        """Reduce the balances by `principal` from `due()` where `paid`, and retire paid-off loans"""
+        self.amounts.own()
+        balance = self.amounts['balance']
+        balance -= np.where(paid, principal, 0)
+        done = balance <= 1e-12 * self.amounts['principal']
+        if self.size is not None:
+            done = done.all(axis=1)
+        if done.any():
+            self.retire(~done)
+
+    def write_off(self, share):
+        """Default on `share` (0 to 1, per economy) of every loan; returns the amount written off"""
+        self.amounts.own()
+        keep = 1 - np.asarray(share)
+        lost = self.outstanding * (1 - keep)
+        self.amounts['balance'][:] *= keep
+        self.amounts['payment'][:] *= keep
+        return lost
+
+    def retire(self, keep):
+        # compact the columns down to the loans still outstanding
+        for book in (self.terms, self.amounts):
+            book.own()
+            n = int(keep.sum())
+            for name in book.names:
+                col = book.arrays[name]
+                col[:n] = col[:book.length][keep]
+            book.length = n
+
+    @property
+    def outstanding(self):
+        return self.amounts['balance'].sum(axis=0)
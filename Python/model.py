@@ -1,10 +1,30 @@
+import copy
 from Python.balancesheet import BalanceSheet
-import pandas as pd
+from Python.ledger import Ledger
+from Python.operations import IDENTITIES, OPERATIONS, Operation
+from Python.history import History
+from Python.journal import Journal
+from Python.loanbook import LoanBook
+from Python.indicators import IndicatorStore
+from Python.rolling import RollingStats
+import numpy as np
 
 class Model:
-    def __init__(self, controller):
-        self.controller = controller
-        self.balance_sheets = dict(zip(self.actors, [BalanceSheet(i) for i in self.actors]))
+    def __init__(self, engine, size=None):
+        self.engine = engine
+        self.size = size
+        self.month = 0
+        # the journal records scalar flows only, so ensembles run without one
+        self.journal = Journal() if size is None else None
+        self.ledger = Ledger(self.actors, size, engine.minor_units)
+        self.balance_sheets = dict(zip(self.actors, [BalanceSheet(i, self.journal, size, self.ledger) for i in self.actors]))
+        self.operations = {}
+        for name, legs in OPERATIONS.items():
+            self.define(name, legs)
+        for name, terms in IDENTITIES.items():
+            self.ledger.add_identity(name, terms)
+        self.history = History(self.ledger) if engine.keep_history else None
+        self.loans = LoanBook(size)  # <-- only filled when the engine runs with loan_book
         self.worker_pool = 100
         self.idle_workers = 100
         self.starting_cpi = 100
@@ -13,45 +33,127 @@ class Model:
         self.current_worker_wage = 0.6
         self.real_startup_cap = 2.5
         self.full_employment_counter = 0
-        self.indicators = pd.DataFrame(
-            data = {
-                'GDP': [0],
-                '12M GDP': [0],
-                'Money Supply': [0],
-                'TTM Average Money Supply': [0],
-                'Worker Incomes': [0],
-                'Capitalist Incomes': [0],
-                'Firm Incomes': [0],
-                'New Business Formation': [0],
-                'TTM New Business Formation': [0]
-            }
+        self.indicators = IndicatorStore(
+            {
+                'GDP': 0,
+                '12M GDP': 0,
+                'Money Supply': 0,
+                'TTM Average Money Supply': 0,
+                'Worker Incomes': 0,
+                'Capitalist Incomes': 0,
+                'Firm Incomes': 0,
+                'New Business Formation': 0,
+                'TTM New Business Formation': 0
+            },
+            size
         )
         
-        self.fiat_indicators = pd.DataFrame(
-            data = {
-                'Nom GDP': [0],
-                'Real GDP': [0],
-                '12M Nom GDP': [0],
-                '12M Real GDP': [0],
-                'Unemployment': [self.idle_workers / self.worker_pool],
-                'Nom Wages': [0],
-                'Real Wages': [0],
-                'TTM Nom Wages': [0],
-                'TTM Real Wages': [0],
-                'New Business Formation': [0],
-                'TTM New Business Formation': [0],
-                'CPI': [self.current_cpi]
-            }
+        self.fiat_indicators = IndicatorStore(
+            {
+                'Nom GDP': 0,
+                'Real GDP': 0,
+                '12M Nom GDP': 0,
+                '12M Real GDP': 0,
+                'Unemployment': self.idle_workers / self.worker_pool,
+                'Nom Wages': 0,
+                'Real Wages': 0,
+                'TTM Nom Wages': 0,
+                'TTM Real Wages': 0,
+                'New Business Formation': 0,
+                'TTM New Business Formation': 0,
+                'CPI': self.current_cpi
+            },
+            size
         )
+        
+        # trailing-window indicators, filled in as each month is appended
+        self.trailing = RollingStats(size)
+        self.trailing.track('12M GDP', 'GDP', '12M')
+        self.trailing.track('TTM Average Money Supply', 'Money Supply', '12M', 'mean')
+        self.trailing.track('TTM New Business Formation', 'New Business Formation', '12M')
+        
+        self.fiat_trailing = RollingStats(size)
+        self.fiat_trailing.track('12M Nom GDP', 'Nom GDP', '12M')
+        self.fiat_trailing.track('12M Real GDP', 'Real GDP', '12M')
+        self.fiat_trailing.track('TTM Nom Wages', 'Nom Wages', '12M')
+        self.fiat_trailing.window('Real Wages', '12M')  # <-- 'TTM Real Wages' is previewed in the frame
+        self.fiat_trailing.track('TTM New Business Formation', 'New Business Formation', '12M')
+        
+        if size is not None:
+            # one value per economy
+            self.idle_workers = np.full(size, self.idle_workers)
+            self.current_cpi = np.full(size, float(self.current_cpi))
+            self.current_worker_wage = np.full(size, self.current_worker_wage)
+            self.full_employment_counter = np.zeros(size, dtype=int)
     
     @property
     def actors(self):
-        if self.controller.economy == 'credit':
+        if self.engine.economy == 'credit':
             return ['Banks', 'Capitalists', 'Firms', 'Workers']
-        elif self.controller.economy == 'fiat':
+        elif self.engine.economy == 'fiat':
             return ['Treasury', 'Capitalists', 'Firms', 'Workers']
-        
-    
-        
-        
-        
\ No newline at end of file
+
+    def define(self, name, legs):
+        """Add or replace an operation; `legs` as in Python.operations.OPERATIONS"""
+        self.operations[name] = Operation(name, legs, self.balance_sheets)
+
+    def apply(self, name, amt):
+        """Post operation `name` for `amt` to every balance sheet it touches"""
+        self.operations[name].apply(amt)
+
+    def next_month(self):
+        """Start a new simulated month"""
+        if self.journal is not None:
+            self.journal.next_month(self.balance_sheets)
+        if self.history is not None:
+            self.history.close()
+        self.month += 1
+
+    def balance_sheets_at(self, month):
+        """Balance sheets as they stood at the end of `month`"""
+        if self.history is not None:
+            return self.history.sheets(month, self.balance_sheets)
+        if self.journal is None:
+            raise ValueError('no account history or journal to rebuild past months from, run with keep_history=True')
+        return self.journal.replay(month)
+
+    def series(self, actor, account):
+        """Month-end balances of one account over the whole run"""
+        if self.history is None:
+            raise ValueError('no account history, run with keep_history=True')
+        return self.history.series(actor, account)
+
+    def forget(self, month):
+        """Drop the account history and journal entries from before `month`, to bound memory on long runs
+
+        The journal keeps back to its latest snapshot at or before `month`.
+        """
+        if self.journal is not None:
+            self.journal.forget(month)
+        if self.history is not None:
+            self.history.forget(month)
+
+    def fork(self, engine=None):
+        """Branch the model at the current month
+
+        Indicator history and the journal are shared copy-on-write, so a
+        fork costs next to nothing and each branch only copies a buffer the
+        first time it writes to it. Balance sheets and trailing windows are
+        small and are copied outright, and the operations are recompiled
+        against the copied ledger.
+        """
+        clone = copy.copy(self)
+        clone.engine = self.engine if engine is None else engine
+        clone.journal = None if self.journal is None else self.journal.fork()
+        clone.ledger = self.ledger.copy()
+        clone.balance_sheets = {actor: bs.fork(clone.journal, clone.ledger) for actor, bs in self.balance_sheets.items()}
+        clone.history = None if self.history is None else self.history.fork(clone.ledger)
+        clone.operations = {}
+        for name, operation in self.operations.items():
+            clone.define(name, operation.definition)
+        clone.loans = self.loans.fork()
+        clone.indicators = self.indicators.fork()
+        clone.fiat_indicators = self.fiat_indicators.fork()
+        clone.trailing = copy.deepcopy(self.trailing)
+        clone.fiat_trailing = copy.deepcopy(self.fiat_trailing)
+        return clone
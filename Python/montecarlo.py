@@ -0,0 +1,105 @@
+import numpy as np
+from Python.engine import DEFAULT_MONTHS
+from Python.ensemble import Ensemble
+from Python.parallel import SharedArray, run_chunks
+
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class StochasticEnsemble(Ensemble):
+    """
+    Ensemble whose economies each follow a random path
+
+    Every economy draws its own propensities to consume once, around the
+    deterministic 0.9 (workers) and 0.4 (capitalists). Every month it
+    draws a lognormal demand shock that scales both, and in the credit
+    economy it may default on a share of its outstanding loans. All draws
+    come from `seed`, so a run is reproducible. `shocks` overrides
+    DEFAULT_SHOCKS.
+    """
+    DEFAULT_SHOCKS = {
+        'worker_propensity_sd': 0.03,
+        'capitalist_propensity_sd': 0.05,
+        'demand_shock_sd': 0.05,  # <-- of the monthly lognormal shock to consumption
+        'default_probability': 0.01,  # <-- monthly chance of a default event in each economy
+        'default_share': 0.2  # <-- share of outstanding loans written off in a default
+    }
+
+    def __init__(self, economy='credit', size=1000, params=None, shocks=None, seed=None, loan_book=False):
+        self.shocks = dict(self.DEFAULT_SHOCKS)
+        if shocks is not None:
+            self.shocks.update(shocks)
+        self.rng = np.random.default_rng(seed)
+        self.worker_propensity = np.clip(self.rng.normal(0.9, self.shocks['worker_propensity_sd'], size), 0, 1)
+        self.capitalist_propensity = np.clip(self.rng.normal(0.4, self.shocks['capitalist_propensity_sd'], size), 0, 1)
+        super().__init__(economy, size, params, loan_book=loan_book)
+
+    def propensities(self):
+        sd = self.shocks['demand_shock_sd']
+        shock = self.rng.lognormal(-sd**2 / 2, sd, self.size)  # <-- mean one
+        # workers can't spend more than their cash
+        return np.minimum(self.worker_propensity * shock, 1), self.capitalist_propensity * shock
+
+    def defaults(self):
+        events = self.rng.random(self.size) < self.shocks['default_probability']
+        if not events.any():
+            return
+        share = np.where(events, self.shocks['default_share'], 0)
+        if self.loan_book:
+            lost = self.model.loans.write_off(share)
+        else:
+            lost = share * self.model.balance_sheets['Capitalists'].get(('Liabilities', 'Capitalists Loans'))
+        self.default_loan(lost)
+
+
+def _run_paths(start, stop, economy, blocks, months, params, shocks, loan_book, spec):
+    # worker side: each block is an ensemble with its own seed, written straight into shared memory
+    out = SharedArray.attach(spec)
+    try:
+        for first, last, seed in blocks[start:stop]:
+            ensemble = StochasticEnsemble(economy, last - first, params, shocks, seed, loan_book)
+            ensemble.run(months)
+            out.array[first:last] = ensemble.indicators.values.swapaxes(0, 1)
+    finally:
+        out.close()
+
+
+def _percentiles(start, stop, spec, q):
+    # worker side: percentiles of a slice of (month, indicator) cells, over all paths
+    paths = SharedArray.attach(spec)
+    try:
+        cells = paths.array.reshape(paths.shape[0], -1)[:, start:stop]
+        return np.percentile(cells, q, axis=0)
+    finally:
+        paths.close()
+
+
+def monte_carlo(economy, paths=1000, months=None, params=None, shocks=None, seed=None,
+                percentiles=PERCENTILES, block=250, processes=None, loan_book=False):
+    """Percentile bands of every indicator over `paths` stochastic runs
+
+    Paths are run in blocks of `block` economies, each block seeded from
+    its own child of SeedSequence(seed), so the result doesn't depend on
+    how the blocks are spread over processes. Workers write paths into
+    shared memory and the percentiles are computed there, in parallel too,
+    so only the bands come back: a DataFrame indexed by month with
+    (indicator, percentile) columns.
+    """
+    months = DEFAULT_MONTHS[economy] if months is None else months
+    children = np.random.SeedSequence(seed).spawn(-(-paths // block))
+    blocks = [(first, min(first + block, paths), child) for first, child in zip(range(0, paths, block), children)]
+    columns = StochasticEnsemble(economy, 1, params).indicators.columns
+    shape = (paths, months + 1, len(columns))
+
+    with SharedArray(shape) as out:
+        run_chunks(_run_paths, len(blocks), (economy, blocks, months, params, shocks, loan_book, out.spec), processes)
+        q = list(percentiles)
+        parts = run_chunks(_percentiles, (months + 1) * len(columns), (out.spec, q), processes)
+    bands = np.concatenate(parts, axis=1).reshape(len(q), months + 1, len(columns))
+    import pandas as pd
+
+    return pd.DataFrame(
+        data=bands.transpose(1, 2, 0).reshape(months + 1, -1),
+        index=pd.RangeIndex(months + 1, name='month'),
+        columns=pd.MultiIndex.from_product([columns, q], names=['indicator', 'percentile'])
+    )
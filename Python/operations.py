@@ -0,0 +1,219 @@
+import numpy as np
+from Python.balancesheet import BalanceSheet
+
+# Every economic operation as a table of postings. Each leg
+# (actor, account_in, account_out, multiplier) reads as
+#     balance_sheets[actor].add_flow(account_in, account_out, multiplier * amt)
+# so account_out moves with account_in when exactly one of them is an asset and
+# against it otherwise. Legs for actors an economy doesn't have are skipped.
+OPERATIONS = {
+    'make_loan': [
+        # add to loan asset, subtract from cash
+        ('Banks', ('Assets', 'Capitalists Loans'), ('Assets', 'Cash'), 1),
+        # add to capitalists accounts, subtract from reserves
+        ('Banks', ('Liabilities', 'Capitalists Accounts'), ('Equity', 'Bank Reserves'), 1),
+        # add to cash asset, offset with loan liability
+        ('Capitalists', ('Assets', 'Cash'), ('Liabilities', 'Capitalists Loans'), 1)
+    ],
+    'invest': [
+        # move cash from capitalist accounts to firm accounts
+        ('Banks', ('Liabilities', 'Firm Accounts'), ('Liabilities', 'Capitalists Accounts'), 1),
+        # add Firm Equity, reduce cash
+        ('Capitalists', ('Assets', 'Investments'), ('Assets', 'Cash'), 1),
+        # add to cash, offset with equity
+        ('Firms', ('Assets', 'Cash'), ('Equity', 'Firm Equity'), 1)
+    ],
+    'pay_workers': [
+        # move money from firm accounts to worker accounts
+        ('Banks', ('Liabilities', 'Worker Accounts'), ('Liabilities', 'Firm Accounts'), 1),
+        # take cash, offset with reduction in equity
+        ('Firms', ('Assets', 'Cash'), ('Equity', 'Firm Equity'), -1),
+        # add to cash, offset with equity
+        ('Workers', ('Assets', 'Cash'), ('Equity', 'Wages'), 1)
+    ],
+    'pay_capitalists': [
+        # move money from firm accounts to capitalists accounts
+        ('Banks', ('Liabilities', 'Capitalists Accounts'), ('Liabilities', 'Firm Accounts'), 1),
+        # add to cash, offset with equity
+        ('Capitalists', ('Assets', 'Cash'), ('Equity', 'Dividends'), 1),
+        # take cash, offset with reduction in equity
+        ('Firms', ('Assets', 'Cash'), ('Equity', 'Firm Equity'), -1)
+    ],
+    'workers_consume': [
+        # move money from worker accounts to firm accounts
+        ('Banks', ('Liabilities', 'Firm Accounts'), ('Liabilities', 'Worker Accounts'), 1),
+        # record revenue
+        ('Firms', ('Assets', 'Cash'), ('Equity', 'Firm Equity'), 1),
+        # reduce cash and equity
+        ('Workers', ('Assets', 'Cash'), ('Equity', 'Consumption'), -1)
+    ],
+    'capitalists_consume': [
+        # move money from capitalists accounts to firm accounts
+        ('Banks', ('Liabilities', 'Firm Accounts'), ('Liabilities', 'Capitalists Accounts'), 1),
+        # consumption
+        ('Capitalists', ('Assets', 'Cash'), ('Equity', 'Consumption'), -1),
+        # record revenue
+        ('Firms', ('Assets', 'Cash'), ('Equity', 'Firm Equity'), 1)
+    ],
+    'repay_loan': [
+        # add to cash, subtract from capitalists loan
+        ('Banks', ('Assets', 'Cash'), ('Assets', 'Capitalists Loans'), 1),
+        # add to bank reserves, subtract from capitalists accounts
+        ('Banks', ('Equity', 'Bank Reserves'), ('Liabilities', 'Capitalists Accounts'), 1),
+        # reduce cash, offset with reduction in liab
+        ('Capitalists', ('Assets', 'Cash'), ('Liabilities', 'Capitalists Loans'), -1)
+    ],
+    'pay_interest': [
+        # move interest from capitalists accounts into the banks' income
+        ('Banks', ('Equity', 'Interest Income'), ('Liabilities', 'Capitalists Accounts'), 1),
+        # reduce cash, offset with interest expense
+        ('Capitalists', ('Assets', 'Cash'), ('Equity', 'Interest Paid'), -1)
+    ],
+    'default_loan': [
+        # write the defaulted loans off against the banks' equity
+        ('Banks', ('Assets', 'Capitalists Loans'), ('Equity', 'Loan Losses'), -1),
+        # the debt is gone, a gain to the capitalists
+        ('Capitalists', ('Liabilities', 'Capitalists Loans'), ('Equity', 'Debt Forgiven'), -1)
+    ],
+    # fiscal_op(amt) is spending when amt <= 0 and taxes otherwise
+    'fiscal_spend': [
+        ('Treasury', ('Assets', 'Cash'), ('Equity', 'Spending'), 1),
+        # collect from Treasury
+        ('Capitalists', ('Assets', 'Cash'), ('Liabilities', 'Govt Contracts'), -1)
+    ],
+    'fiscal_tax': [
+        ('Treasury', ('Assets', 'Cash'), ('Equity', 'Taxes'), 1),
+        ('Capitalists', ('Assets', 'Cash'), ('Equity', 'Taxes Paid'), -1)
+    ]
+}
+
+
+class Operation:
+    """
+    One entry of OPERATIONS compiled against a model's ledger
+
+    The legs are reduced to a sparse vector over the (actors x accounts)
+    balance matrix: the cells they touch and the net coefficient of `amt`
+    in each, plus the same for the per-type totals. Applying the operation
+    is then one vectorized add whatever the number of legs, for a scalar
+    `amt` as well as for a length-N vector over an ensemble.
+    """
+    def __init__(self, name, legs, balance_sheets):
+        self.name = name
+        self.definition = legs
+        self.legs = []  # <-- (sheet, account_in, account_out, multiplier) for the actors present
+        self.sheets = []
+        self.records = []  # <-- (journal, actor, account_in, account_out, multiplier) as journal codes
+        self.ledger = None
+        cells = {}
+        totals = {}
+        for actor, account_in, account_out, multiplier in legs:
+            if actor not in balance_sheets:
+                continue
+            bs = balance_sheets[actor]
+            self.ledger = bs.ledger
+            self.legs.append((bs, account_in, account_out, multiplier))
+            if bs not in self.sheets:
+                self.sheets.append(bs)
+            if bs.journal is not None:
+                journal = bs.journal
+                self.records.append((journal, bs.actor_code, journal.account_code(account_in), journal.account_code(account_out), multiplier))
+            offset = 1 if (account_in[0] == 'Assets') != (account_out[0] == 'Assets') else -1
+            for account, coef in ((account_in, multiplier), (account_out, multiplier * offset)):
+                col = self.ledger.column(account)
+                cells[bs.row, col] = cells.get((bs.row, col), 0) + coef
+                total = (bs.row, self.ledger.types[col])
+                totals[total] = totals.get(total, 0) + coef
+        self.rows, self.cols, self.coefs = self.compile(cells)
+        rows, types, self.total_coefs = self.compile(totals)
+        if self.ledger is not None and self.ledger.minor_units is not None:
+            if np.any(self.coefs != np.rint(self.coefs)):
+                raise ValueError(f'{name}: multipliers must be whole numbers on a fixed-point ledger')
+            # rounded once to minor units, the amount then moves every leg by the same integer
+            self.coefs = self.coefs.astype(np.int64)
+            self.total_coefs = self.total_coefs.astype(np.int64)
+        self.total_index = rows * len(BalanceSheet.TYPES) + types
+        self.stride = None  # <-- ledger columns the flat index was computed for
+        self.opened = False
+
+    @staticmethod
+    def compile(cells):
+        """Rows, columns and coefficients of the non-zero cells"""
+        cells = {cell: coef for cell, coef in cells.items() if coef != 0}
+        rows = np.array([row for row, col in cells], dtype=np.intp)
+        cols = np.array([col for row, col in cells], dtype=np.intp)
+        return rows, cols, np.array(list(cells.values()), dtype=float)
+
+    def open(self):
+        """Show every account the legs touch on their sheets, in posting order"""
+        for bs, account_in, account_out, multiplier in self.legs:
+            bs.slot(account_in)
+            bs.slot(account_out)
+        self.opened = True
+
+    def apply(self, amt):
+        ledger = self.ledger
+        if ledger is None:
+            return
+        if not self.opened:
+            self.open()
+        if self.stride != ledger.balances.shape[1]:
+            # the ledger grew, so the flat positions of the cells moved
+            self.stride = ledger.balances.shape[1]
+            self.index = self.rows * self.stride + self.cols
+        if ledger.minor_units is not None:
+            amt = ledger.units(amt)
+        if isinstance(amt, np.ndarray) and amt.ndim:
+            # one row of coefficients per cell, one column per economy
+            amts = amt[np.newaxis]
+            ledger.flat[self.index] += self.coefs[:, np.newaxis] * amts
+            ledger.flat_totals[self.total_index] += self.total_coefs[:, np.newaxis] * amts
+        else:
+            ledger.flat[self.index] += self.coefs * amt
+            ledger.flat_totals[self.total_index] += self.total_coefs * amt
+        for bs in self.sheets:
+            bs.touch()
+        if self.records and ledger.minor_units is not None:
+            amt = ledger.money(amt)
+        for journal, actor, account_in, account_out, multiplier in self.records:
+            journal.record(actor, account_in, account_out, multiplier * amt)
+
+
+# Stock-flow identities the operations above must preserve, each a list of
+# (actor, account, coefficient) terms that sum to zero. Identities naming an
+# actor the economy doesn't have are skipped.
+IDENTITIES = {
+    # bank deposits are the depositors' cash
+    'Capitalists Accounts = Capitalists Cash': [
+        ('Banks', ('Liabilities', 'Capitalists Accounts'), 1),
+        ('Capitalists', ('Assets', 'Cash'), -1)
+    ],
+    'Firm Accounts = Firms Cash': [
+        ('Banks', ('Liabilities', 'Firm Accounts'), 1),
+        ('Firms', ('Assets', 'Cash'), -1)
+    ],
+    'Worker Accounts = Workers Cash': [
+        ('Banks', ('Liabilities', 'Worker Accounts'), 1),
+        ('Workers', ('Assets', 'Cash'), -1)
+    ],
+    # the banks' loan asset is the capitalists' loan liability
+    'Capitalists Loans': [
+        ('Banks', ('Assets', 'Capitalists Loans'), 1),
+        ('Capitalists', ('Liabilities', 'Capitalists Loans'), -1)
+    ],
+    # fiat money is the Treasury's liability, so all cash nets to zero
+    'Cash': [
+        ('Treasury', ('Assets', 'Cash'), 1),
+        ('Capitalists', ('Assets', 'Cash'), 1),
+        ('Firms', ('Assets', 'Cash'), 1),
+        ('Workers', ('Assets', 'Cash'), 1)
+    ],
+    'Spending = Govt Contracts': [
+        ('Treasury', ('Equity', 'Spending'), 1),
+        ('Capitalists', ('Liabilities', 'Govt Contracts'), 1)
+    ],
+    'Taxes = Taxes Paid': [
+        ('Treasury', ('Equity', 'Taxes'), 1),
+        ('Capitalists', ('Equity', 'Taxes Paid'), 1)
+    ]
+}
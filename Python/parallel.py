@@ -0,0 +1,77 @@
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+class SharedArray:
+    """
+    NumPy array in shared memory that worker processes attach to by name,
+    so results are written in place instead of being pickled back
+    """
+    def __init__(self, shape, dtype=np.float64, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def spec(self):
+        """Picklable description used by workers to attach"""
+        return self.shm.name, self.shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, spec):
+        name, shape, dtype = spec
+        return cls(shape, dtype, name=name)
+
+    def close(self):
+        del self.array
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def chunks(n, k):
+    """Split range(n) into at most k contiguous (start, stop) pieces"""
+    k = max(1, min(n, k))
+    bounds = np.linspace(0, n, k + 1).astype(int)
+    return [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def run_chunks(fn, n, args=(), processes=None, pool=None):
+    """Call fn(start, stop, *args) over pieces of range(n) across a process pool
+
+    Returns the list of per-chunk results in order. With processes=1 the
+    chunks run in this process, which is handy for debugging. Pass an open
+    ProcessPoolExecutor as `pool` to reuse its workers across calls.
+    """
+    processes = processes or cpu_count()
+    # a few chunks per worker evens out runs that end at different speeds
+    pieces = chunks(n, processes * 4)
+    if processes == 1:
+        return [fn(start, stop, *args) for start, stop in pieces]
+    if pool is not None:
+        futures = [pool.submit(fn, start, stop, *args) for start, stop in pieces]
+        return [f.result() for f in futures]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(fn, start, stop, *args) for start, stop in pieces]
+        return [f.result() for f in futures]
@@ -0,0 +1,162 @@
+import tracemalloc
+from time import perf_counter
+
+# frame phases, by the engine method that runs them
+PHASES = [
+    'make_loan',
+    'invest',
+    'pay_workers',
+    'workers_consume',
+    'capitalists_consume',
+    'pay_capitalists',
+    'repay_loan',
+    'pay_interest',
+    'default_loan',
+    'fiscal_op'
+]
+
+
+class Profiler:
+    """
+    Opt-in timers for a running engine (and its UI)
+
+    Attaching replaces the instrumented methods with timed wrappers on the
+    instances themselves and detaching deletes them again, so nothing is
+    paid when no profiler is attached. Times are inclusive: 'frame' contains
+    its phases, and a phase contains the operations it posts. With
+    `trace_memory=True` the net bytes allocated by each call are tracked as
+    well, at a considerable cost in speed.
+
+        with engine.profile() as profiler:
+            engine.run(300)
+        profiler.df
+    """
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stats = {}  # <-- name -> [calls, total seconds, max seconds, last seconds, net bytes]
+        self.wrapped = []
+        self.started = None
+        self.started_tracing = False  # <-- whether attach turned tracemalloc on, so detach turns it off
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.detach()
+
+    def attach(self, engine, view=None):
+        """Instrument the engine's frame, phases and operations, and the view's refreshes"""
+        if self.started is None:
+            self.started = perf_counter()
+            if self.trace_memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+        model = engine.model
+        self.wrap(engine, 'frame', 'frame')
+        for phase in PHASES:
+            self.wrap(engine, phase, 'phase ' + phase)
+        self.wrap(model, 'next_month', 'next_month')
+        self.wrap(model.trailing, 'update', 'trailing windows')
+        self.wrap(model.fiat_trailing, 'update', 'trailing windows')
+        self.wrap(model.indicators, 'append_row', 'append indicators')
+        self.wrap(model.fiat_indicators, 'append_row', 'append indicators')
+        self.wrap(model.ledger, 'check', 'ledger check')
+        for name, operation in model.operations.items():
+            self.wrap(operation, 'apply', 'operation ' + name)
+        if view is not None:
+            for method in ('refresh', 'refresh_balance_sheets', 'refresh_charts'):
+                self.wrap(view, method, 'view ' + method)
+        return self
+
+    def detach(self):
+        """Put the original methods back"""
+        for obj, method in reversed(self.wrapped):
+            del obj.__dict__[method]
+        self.wrapped = []
+        if self.started_tracing:
+            # leave tracing on if someone else started it
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    def wrap(self, obj, method, name):
+        """Time every call of `obj.method` under `name`"""
+        if method in obj.__dict__:
+            return  # <-- already instrumented
+        fn = getattr(obj, method)
+        stat = self.stats.setdefault(name, [0, 0.0, 0.0, 0.0, 0])
+        clock = perf_counter
+
+        if self.trace_memory:
+            memory = tracemalloc.get_traced_memory
+
+            def timed(*args, **kwargs):
+                allocated = memory()[0]
+                started = clock()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    elapsed = clock() - started
+                    stat[0] += 1
+                    stat[1] += elapsed
+                    stat[2] = max(stat[2], elapsed)
+                    stat[3] = elapsed
+                    stat[4] += memory()[0] - allocated
+        else:
+            def timed(*args, **kwargs):
+                started = clock()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    elapsed = clock() - started
+                    stat[0] += 1
+                    stat[1] += elapsed
+                    stat[2] = max(stat[2], elapsed)
+                    stat[3] = elapsed
+
+        setattr(obj, method, timed)
+        self.wrapped.append((obj, method))
+
+    def live(self):
+        """Metrics of the run so far, cheap enough to poll from the UI"""
+        frames, total, slowest, last, net = self.stats.get('frame', [0, 0.0, 0.0, 0.0, 0])
+        phases = {name: stat[3] for name, stat in self.stats.items() if name.startswith('phase ') and stat[0]}
+        elapsed = 0.0 if self.started is None else perf_counter() - self.started
+        metrics = {
+            'frames': frames,
+            'frames per second': frames / elapsed if elapsed else 0.0,
+            'mean frame ms': 1e3 * total / frames if frames else 0.0,
+            'last frame ms': 1e3 * last,
+            'slowest phase': max(phases, key=phases.get) if phases else None
+        }
+        if self.trace_memory and tracemalloc.is_tracing():
+            metrics['traced MB'] = tracemalloc.get_traced_memory()[0] / 2**20
+        return metrics
+
+    @property
+    def df(self):
+        """One row per instrumented name, slowest first"""
+        import pandas as pd
+        frame_total = self.stats.get('frame', [0, 0.0])[1]
+        rows = {}
+        for name, (calls, total, slowest, last, net) in self.stats.items():
+            if not calls:
+                continue
+            row = {
+                'calls': calls,
+                'total s': total,
+                'mean us': 1e6 * total / calls,
+                'max us': 1e6 * slowest,
+                '% of frames': 100 * total / frame_total if frame_total else float('nan')
+            }
+            if self.trace_memory:
+                row['net KB'] = net / 2**10
+            rows[name] = row
+        df = pd.DataFrame.from_dict(rows, orient='index')
+        if len(df):
+            df = df.sort_values('total s', ascending=False)
+        return df
+
+    def reset(self):
+        for stat in self.stats.values():
+            stat[:] = [0, 0.0, 0.0, 0.0, 0]
+        self.started = perf_counter()
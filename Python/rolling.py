@@ -0,0 +1,87 @@
+import numpy as np
+
+def window_months(window):
+    """Window length in months from an int or a string such as '12M' or '10Y'"""
+    if isinstance(window, str):
+        unit = window[-1].upper()
+        return int(window[:-1]) * {'M': 1, 'Q': 3, 'Y': 12}[unit]
+    return int(window)
+
+
+class RollingWindow:
+    """
+    Ring buffer keeping the sum of the last `window` values in O(1) per push
+    """
+    def __init__(self, window, size=None):
+        self.window = window_months(window)
+        shape = () if size is None else (size,)
+        self.values = np.zeros((self.window,) + shape)
+        self.pos = 0
+        self.sum = 0.0 if size is None else np.zeros(size)
+
+    def push(self, value):
+        self.sum = self.sum + value - self.values[self.pos]
+        self.values[self.pos] = value
+        self.pos = (self.pos + 1) % self.window
+        if self.pos == 0:
+            # re-sum once per lap so add/subtract rounding can't build up
+            self.sum = self.values.sum(axis=0)
+        return self.sum
+
+    def preview(self, value):
+        """Sum of the newest window - 1 values plus `value`, without pushing it"""
+        return self.sum - self.values[self.pos] + value
+
+    @property
+    def mean(self):
+        return self.sum / self.window
+
+
+class EMA:
+    """Exponential moving average with the usual span -> alpha = 2 / (span + 1)"""
+    def __init__(self, window, size=None):
+        self.alpha = 2 / (window_months(window) + 1)
+        self.value = 0.0 if size is None else np.zeros(size)
+
+    def push(self, value):
+        self.value = self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+
+class RollingStats:
+    """
+    Trailing statistics of indicator columns, updated once per month
+
+    `track('36M Real GDP', 'Real GDP', '36M')` adds a column holding the
+    36-month sum of 'Real GDP'; stat may be 'sum', 'mean' or 'ema'. Sums and
+    means over the same source and window share one ring buffer.
+    """
+    def __init__(self, size=None):
+        self.size = size
+        self.windows = {}  # <-- (source, months) -> RollingWindow
+        self.emas = {}  # <-- name -> (source, EMA)
+        self.tracked = {}  # <-- name -> (stat, RollingWindow)
+
+    def window(self, source, window='12M'):
+        key = (source, window_months(window))
+        if key not in self.windows:
+            self.windows[key] = RollingWindow(key[1], self.size)
+        return self.windows[key]
+
+    def track(self, name, source, window='12M', stat='sum'):
+        if stat == 'ema':
+            self.emas[name] = (source, EMA(window, self.size))
+        elif stat in ('sum', 'mean'):
+            self.tracked[name] = (stat, self.window(source, window))
+        else:
+            raise ValueError(f'unknown rolling statistic {stat!r}')
+
+    def update(self, row):
+        """Push this month's values and add every tracked statistic to `row`"""
+        for (source, months), window in self.windows.items():
+            window.push(row[source])
+        for name, (stat, window) in self.tracked.items():
+            row[name] = window.sum if stat == 'sum' else window.mean
+        for name, (source, ema) in self.emas.items():
+            row[name] = ema.push(row[source])
+        return row
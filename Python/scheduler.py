@@ -0,0 +1,80 @@
+import asyncio
+from time import monotonic
+
+class Scheduler:
+    """
+    Runs simulation frames as a task on the asyncio event loop
+
+    In a notebook this is the kernel's own loop, so frames, widget callbacks
+    and cell executions all take turns on one thread and never touch the
+    model at the same time. There is at most one run task; starting again
+    while it runs just queues more months. `rate` is in frames per second,
+    None runs as fast as possible while still yielding to the loop between
+    frames so the UI stays responsive.
+    """
+    def __init__(self, frame, rate=5, on_stop=None):
+        self.frame = frame
+        self.rate = rate
+        self.on_stop = on_stop
+        self.remaining = 0
+        self.paused = False
+        self.task = None
+        self._resume = asyncio.Event()
+        self._resume.set()
+
+    @property
+    def running(self):
+        return self.task is not None and not self.task.done()
+
+    def start(self, months):
+        self.remaining += months
+        if not self.running:
+            self.resume()
+            self.task = asyncio.ensure_future(self._run())
+
+    def pause(self):
+        self.paused = True
+        self._resume.clear()
+
+    def resume(self):
+        self.paused = False
+        self._resume.set()
+
+    def step(self):
+        """Run exactly one frame now; only while paused or idle"""
+        if self.running and not self.paused:
+            return
+        self.frame()
+        self.remaining = max(0, self.remaining - 1)
+        if not self.running and self.on_stop is not None:
+            self.on_stop()
+
+    def cancel(self):
+        self.remaining = 0
+        if self.running:
+            self.task.cancel()
+        self.resume()
+
+    async def wait(self):
+        """Wait for the current run to finish"""
+        if self.task is not None:
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        try:
+            while self.remaining > 0:
+                await self._resume.wait()
+                if self.remaining <= 0:
+                    # single steps used up the run while it was paused
+                    break
+                started = monotonic()
+                self.frame()
+                self.remaining -= 1
+                delay = 0 if not self.rate else 1 / self.rate - (monotonic() - started)
+                await asyncio.sleep(max(0, delay))
+        finally:
+            if self.on_stop is not None:
+                self.on_stop()
@@ -0,0 +1,398 @@
+"""
+Local dashboard server: one simulation shown to many browsers
+
+    python -m Python serve --economy fiat --surplus -20
+
+runs one engine and serves a dashboard at http://127.0.0.1:8765/. Every
+month is encoded once, as a WebSocket frame of its indicators and balance
+changes, and the same bytes are queued for every client. A client joining
+late, or one too slow to keep up, is sent a snapshot of the current state
+and carries on from there. Anyone connected can change the policy params
+or pause the run. Standard library asyncio only; it listens on localhost
+unless told otherwise, and only answers requests addressed to localhost on
+its port, and WebSocket upgrades from pages served there, so other sites
+open in the browser can't drive it.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import struct
+import numpy as np
+from Python.scheduler import Scheduler
+
+GUID = b'258EAFA5-E914-47DA-95CA-C5AB0DC85B11'  # <-- fixed by RFC 6455
+TEXT, CLOSE, PING, PONG = 0x1, 0x8, 0x9, 0xA
+MAX_MESSAGE = 1 << 16  # <-- clients only send small commands
+LOCAL_HOSTS = ('localhost', '127.0.0.1', '[::1]')
+POLICY_PARAMS = ('budget_surplus', 'required_bank_reserves')  # <-- the only params clients may change
+
+
+def encode_frame(payload, opcode=TEXT):
+    """Unmasked server-to-client WebSocket frame"""
+    n = len(payload)
+    if n < 126:
+        header = struct.pack('!BB', 0x80 | opcode, n)
+    elif n < 1 << 16:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+    return header + payload
+
+
+async def read_frame(reader):
+    """(opcode, payload) of the next client frame"""
+    first, second = await reader.readexactly(2)
+    n = second & 0x7F
+    if n == 126:
+        n, = struct.unpack('!H', await reader.readexactly(2))
+    elif n == 127:
+        n, = struct.unpack('!Q', await reader.readexactly(8))
+    if n > MAX_MESSAGE:
+        raise ConnectionError(f'client frame of {n} bytes')
+    mask = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(n)
+    if mask is not None and n:
+        key = (mask * (n // 4 + 1))[:n]
+        payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(key, 'big')).to_bytes(n, 'big')
+    return first & 0x0F, payload
+
+
+def jsonable(value):
+    # NumPy values as JSON, with NaN (not valid JSON) as null
+    if isinstance(value, np.ndarray):
+        return [jsonable(v) for v in value.tolist()]
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+class Client:
+    """One WebSocket connection and its bounded queue of encoded frames"""
+    def __init__(self, writer, queue_size):
+        self.writer = writer
+        self.queue = asyncio.Queue(queue_size)
+        self.resyncs = 0
+
+    def send(self, frame, snapshot):
+        """Queue a frame; a client that fell `queue_size` frames behind skips to `snapshot()` instead"""
+        try:
+            self.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            # missed updates make the backlog useless, so replace it with the state as it is now
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(snapshot())
+            self.resyncs += 1
+
+    async def pump(self):
+        while True:
+            frame = await self.queue.get()
+            self.writer.write(frame)
+            await self.writer.drain()  # <-- a slow reader holds up only its own queue
+
+
+class DashboardServer:
+    """
+    Runs `engine` at `rate` months a second (None for flat out) and fans its
+    months out to every WebSocket client
+
+    The engine streams with `retention` (see `Engine.stream`), which bounds
+    both memory and the history a snapshot carries. `months=None` runs
+    until the server is stopped.
+    """
+    def __init__(self, engine, host='127.0.0.1', port=8765, rate=5, months=None, retention=240, queue_size=32):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.months = months
+        self.queue_size = queue_size
+        self.records = engine.stream(None, retention, deltas=True)
+        self.scheduler = Scheduler(self.frame, rate)
+        self.clients = set()
+        self.connections = set()  # <-- handler tasks, finished off by `stop`
+        self.encoded = 0  # <-- frames encoded, one per month and per snapshot
+        self._snapshot = None  # <-- (month, json, frame), shared by everyone asking in the same month
+        self.server = None
+
+    def frame(self):
+        record = next(self.records)
+        message = {
+            'type': 'month',
+            'month': record.month,
+            'indicators': {col: jsonable(value) for col, value in record.indicators.items()},
+            'deltas': [[actor, type, name, jsonable(change)] for (actor, (type, name)), change in record.deltas.items()]
+        }
+        self.broadcast(message)
+
+    def broadcast(self, message):
+        frame = encode_frame(json.dumps(message).encode())
+        self.encoded += 1
+        for client in list(self.clients):
+            client.send(frame, self.snapshot_frame)
+
+    def snapshot(self):
+        """The current state as JSON bytes: params, retained indicators and every balance sheet"""
+        model = self.engine.model
+        if self._snapshot is None or self._snapshot[0] != model.month:
+            indicators = self.engine.indicators
+            message = {
+                'type': 'snapshot',
+                'economy': self.engine.economy,
+                'month': model.month,
+                'params': {name: jsonable(value) for name, value in self.engine.params.items()},
+                'paused': self.scheduler.paused,
+                'months': jsonable(indicators.index),
+                'indicators': {col: jsonable(indicators[col]) for col in indicators.columns},
+                'balance_sheets': {
+                    actor: [[type, name, jsonable(bs.get((type, name)))] for type, name in bs.accounts]
+                    for actor, bs in model.balance_sheets.items()
+                }
+            }
+            payload = json.dumps(message).encode()
+            self._snapshot = (model.month, payload, encode_frame(payload))
+            self.encoded += 1
+        return self._snapshot[1]
+
+    def snapshot_frame(self):
+        self.snapshot()
+        return self._snapshot[2]
+
+    def command(self, payload):
+        """Apply a client message: {"params": {name: value}} and/or {"pause": true|false}"""
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if not isinstance(message, dict):
+            return
+        params = message.get('params')
+        if isinstance(params, dict):
+            changed = {name: float(value) for name, value in params.items()
+                       if name in POLICY_PARAMS and name in self.engine.params and isinstance(value, (int, float))
+                       and not isinstance(value, bool) and math.isfinite(value)}
+            if changed:
+                self.engine.params.update(changed)
+                self._snapshot = None
+                self.broadcast({'type': 'params', 'params': changed})
+        if isinstance(message.get('pause'), bool):
+            if message['pause']:
+                self.scheduler.pause()
+            else:
+                self.scheduler.resume()
+            self._snapshot = None
+            self.broadcast({'type': 'paused', 'paused': self.scheduler.paused})
+
+    async def handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.connections.add(task)
+        try:
+            await self.route(reader, writer)
+        finally:
+            self.connections.discard(task)
+
+    async def route(self, reader, writer):
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            request, *lines = head.decode('latin-1').split('\r\n')
+            method, path, version = request.split(' ', 2)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            writer.close()
+            return
+        headers = {}
+        for line in lines:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        path = path.split('?', 1)[0]
+        if not self.local(headers):
+            await self.respond(writer, 403, 'text/plain', b'forbidden')
+        elif path == '/ws' and headers.get('upgrade', '').lower() == 'websocket':
+            await self.websocket(reader, writer, headers)
+        elif method != 'GET':
+            await self.respond(writer, 405, 'text/plain', b'method not allowed')
+        elif path == '/':
+            await self.respond(writer, 200, 'text/html; charset=utf-8', PAGE.encode())
+        elif path == '/snapshot':
+            await self.respond(writer, 200, 'application/json', self.snapshot())
+        else:
+            await self.respond(writer, 404, 'text/plain', b'not found')
+
+    def local(self, headers):
+        """Whether a request is addressed to this server on localhost, and comes from its own page if from a browser"""
+        hosts = set(LOCAL_HOSTS)
+        if self.host not in ('', '0.0.0.0', '::'):
+            hosts.add(self.host)
+        authorities = {f'{host}:{self.port}' for host in hosts}
+        if headers.get('host', '').lower() not in authorities:
+            return False  # <-- also stops DNS rebinding, where a foreign name resolves to 127.0.0.1
+        origin = headers.get('origin')
+        # browsers always send Origin on WebSocket upgrades, other clients needn't
+        return origin is None or origin.lower() in {'http://' + authority for authority in authorities}
+
+    async def respond(self, writer, status, content_type, body):
+        reason = {200: 'OK', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed'}[status]
+        writer.write(
+            f'HTTP/1.1 {status} {reason}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+            f'Cache-Control: no-store\r\nConnection: close\r\n\r\n'.encode() + body
+        )
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def websocket(self, reader, writer, headers):
+        key = headers.get('sec-websocket-key')
+        if not key:
+            await self.respond(writer, 400, 'text/plain', b'missing Sec-WebSocket-Key')
+            return
+        accept = base64.b64encode(hashlib.sha1(key.encode() + GUID).digest()).decode()
+        writer.write(
+            'HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n'.encode()
+        )
+        client = Client(writer, self.queue_size)
+        client.queue.put_nowait(self.snapshot_frame())  # <-- late joiners start from the current state
+        self.clients.add(client)
+        pump = asyncio.ensure_future(client.pump())
+        try:
+            while not pump.done():
+                opcode, payload = await read_frame(reader)
+                if opcode == CLOSE:
+                    writer.write(encode_frame(b'', CLOSE))
+                    break
+                if opcode == PING:
+                    writer.write(encode_frame(payload, PONG))
+                elif opcode == TEXT:
+                    self.command(payload)
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients.discard(client)
+            pump.cancel()
+            writer.close()
+
+    async def start(self):
+        """Start listening and simulating; `self.port` is the bound port (useful with port=0)"""
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.scheduler.start(math.inf if self.months is None else self.months)
+        return self
+
+    async def stop(self):
+        self.scheduler.cancel()
+        await self.scheduler.wait()
+        self.server.close()
+        for task in list(self.connections):
+            task.cancel()
+        await asyncio.gather(*self.connections, return_exceptions=True)
+        await self.server.wait_closed()
+
+    async def serve(self):
+        await self.start()
+        print(f'dashboard at http://{self.host}:{self.port}/', flush=True)
+        async with self.server:
+            await self.server.serve_forever()
+
+    def run(self):
+        """Serve until interrupted"""
+        try:
+            asyncio.run(self.serve())
+        except KeyboardInterrupt:
+            pass
+
+
+PAGE = '''<!doctype html>
+<html><head><meta charset="utf-8"><title>MMT simulator</title>
+<style>
+body { font: 14px sans-serif; margin: 1em 2em; }
+table { border-collapse: collapse; margin: 0 2em 1em 0; vertical-align: top; display: inline-table; }
+td, th { padding: 2px 8px; text-align: right; }
+th { text-align: left; }
+caption { font-weight: bold; text-align: left; }
+polyline { fill: none; stroke: #1f77b4; stroke-width: 1.5; }
+</style></head>
+<body>
+<h3><span id="economy"></span> economy, month <span id="month">-</span> <span id="status"></span></h3>
+<div id="params"></div>
+<table id="indicators"><caption>Indicators</caption></table>
+<div id="sheets"></div>
+<script>
+const MAX_POINTS = 600;
+let state = null, queued = false;
+const fmt = v => v === null || v === undefined ? '' : Math.abs(v) >= 1e5 ? v.toExponential(3) : v.toFixed(2);
+
+function spark(values) {
+  const v = values.filter(x => x !== null);
+  if (v.length < 2) return '';
+  const lo = Math.min(...v), hi = Math.max(...v), span = hi - lo || 1;
+  const pts = values.map((x, i) => x === null ? '' : `${i * 160 / (values.length - 1)},${28 - (x - lo) * 26 / span}`).join(' ');
+  return `<svg width="160" height="30"><polyline points="${pts}"/></svg>`;
+}
+
+function render() {
+  queued = false;
+  document.getElementById('economy').textContent = state.economy;
+  document.getElementById('month').textContent = state.month;
+  document.getElementById('status').textContent = state.paused ? '(paused)' : '';
+  let rows = '<caption>Indicators</caption>';
+  for (const [col, values] of Object.entries(state.indicators))
+    rows += `<tr><th>${col}</th><td>${fmt(values[values.length - 1])}</td><td>${spark(values)}</td></tr>`;
+  document.getElementById('indicators').innerHTML = rows;
+  let sheets = '';
+  for (const [actor, accounts] of Object.entries(state.sheets)) {
+    sheets += `<table><caption>${actor}</caption>`;
+    for (const [account, value] of Object.entries(accounts)) sheets += `<tr><th>${account}</th><td>${fmt(value)}</td></tr>`;
+    sheets += '</table>';
+  }
+  document.getElementById('sheets').innerHTML = sheets;
+}
+
+function renderParams() {
+  let html = '';
+  for (const [name, value] of Object.entries(state.params))
+    if (typeof value === 'number') html += `${name} <input size="6" value="${value}" onchange="send({params: {'${name}': Number(this.value)}})"> `;
+  html += `<button onclick="send({pause: !state.paused})">pause / resume</button>`;
+  document.getElementById('params').innerHTML = html;
+}
+
+const ws = new WebSocket(`ws://${location.host}/ws`);
+const send = message => ws.send(JSON.stringify(message));
+ws.onclose = () => { document.getElementById('status').textContent = '(disconnected)'; };
+ws.onmessage = event => {
+  const m = JSON.parse(event.data);
+  if (m.type === 'snapshot') {
+    state = {economy: m.economy, month: m.month, params: m.params, paused: m.paused, indicators: m.indicators, sheets: {}};
+    for (const [actor, accounts] of Object.entries(m.balance_sheets)) {
+      state.sheets[actor] = {};
+      for (const [type, name, value] of accounts) state.sheets[actor][`${type}: ${name}`] = value;
+    }
+    renderParams();
+  } else if (!state) {
+    return;
+  } else if (m.type === 'month') {
+    state.month = m.month;
+    for (const [col, value] of Object.entries(m.indicators)) {
+      const values = state.indicators[col] = state.indicators[col] || [];
+      values.push(value);
+      if (values.length > MAX_POINTS) values.shift();
+    }
+    for (const [actor, type, name, change] of m.deltas) {
+      const sheet = state.sheets[actor] = state.sheets[actor] || {};
+      sheet[`${type}: ${name}`] = (sheet[`${type}: ${name}`] || 0) + change;
+    }
+  } else if (m.type === 'params') {
+    Object.assign(state.params, m.params);
+    renderParams();
+  } else if (m.type === 'paused') {
+    state.paused = m.paused;
+  }
+  if (!queued) { queued = true; requestAnimationFrame(render); }
+};
+</script>
+</body></html>
+'''
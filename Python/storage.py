@@ -0,0 +1,176 @@
+"""
+Columnar persistence of runs, ensembles and sweeps
+
+`save(engine, path)` writes a run as a directory of two tables:
+
+    indicators       one row per month (per month and economy for ensembles)
+    balance_sheets   month, actor, type, account, balance, one row per account
+
+Single runs store the state of every month, rebuilt from the journal in
+one pass; ensembles have no journal and store the current month only. The
+economy, month, size, loan_book and params are kept in each table's schema
+metadata.
+
+Tables are Arrow IPC files by default, which `read_table` memory-maps so
+only the pages actually touched are read, or Parquet with
+format='parquet'. `iter_batches` walks a table of either kind batch by
+batch, for results larger than memory. pyarrow is only imported when used.
+"""
+import json
+import os
+import numpy as np
+from Python.indicators import IndicatorStore
+
+FORMATS = {'arrow': '.arrow', 'parquet': '.parquet'}
+METADATA_KEY = b'mmt_simulator'
+
+
+def write_table(table, path):
+    """Write an Arrow table as Parquet if `path` ends in .parquet, else as an Arrow IPC file"""
+    import pyarrow as pa
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        pq.write_table(table, path)
+    else:
+        with pa.OSFile(path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+
+def read_table(path, columns=None, memory_map=True):
+    """Read a table written by `write_table`; Arrow IPC files are mapped, not loaded"""
+    import pyarrow as pa
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns, memory_map=memory_map)
+    source = pa.memory_map(path) if memory_map else pa.OSFile(path)
+    table = pa.ipc.open_file(source).read_all()
+    return table if columns is None else table.select(columns)
+
+
+def iter_batches(path, columns=None, batch_size=65536):
+    """Yield the record batches of a table, of at most `batch_size` rows, without holding all of it in memory"""
+    import pyarrow as pa
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns)
+        return
+    reader = pa.ipc.open_file(pa.memory_map(path))
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        if columns is not None:
+            batch = batch.select(columns)
+        # slices are views into the mapped file, as the batches are
+        for offset in range(0, batch.num_rows, batch_size):
+            yield batch.slice(offset, batch_size)
+
+
+def metadata(table):
+    """Run metadata stored with a table by `save`, or {}"""
+    raw = (table.schema.metadata or {}).get(METADATA_KEY)
+    return {} if raw is None else json.loads(raw)
+
+
+def with_metadata(table, meta):
+    # params may hold NumPy arrays for ensembles
+    raw = json.dumps(meta, default=lambda value: np.asarray(value).tolist())
+    return table.replace_schema_metadata({**(table.schema.metadata or {}), METADATA_KEY: raw})
+
+
+def labels(values):
+    """Dictionary-encoded Arrow strings from a list of labels"""
+    import pyarrow as pa
+    dictionary = sorted(set(values))
+    codes = {value: i for i, value in enumerate(dictionary)}
+    return pa.DictionaryArray.from_arrays(
+        pa.array([codes[value] for value in values], pa.int32()),
+        pa.array(dictionary, pa.string())
+    )
+
+
+def balance_sheet_table(model):
+    """Long table of account balances: every month for a single run, the current one for an ensemble"""
+    import pyarrow as pa
+    if model.journal is not None:
+        cells, balances = model.journal.history()
+        months = len(balances)
+        first = model.journal.first
+        columns = {'month': np.repeat(np.arange(first, first + months, dtype=np.int32), len(cells))}
+        repeat = months
+    else:
+        cells = [(actor, account) for actor, bs in model.balance_sheets.items() for account in bs.accounts]
+        balances = np.array([model.balance_sheets[actor].get(account) for actor, account in cells])
+        size = model.size
+        columns = {
+            'month': np.full(len(cells) * size, model.month, dtype=np.int32),
+            'economy': np.tile(np.arange(size, dtype=np.int32), len(cells))
+        }
+        repeat = 1
+        cells = [cell for cell in cells for economy in range(size)]  # <-- cell-major, like `balances`
+    actors = labels([actor for actor, account in cells] * repeat)
+    types = labels([account[0] for actor, account in cells] * repeat)
+    accounts = labels([account[1] for actor, account in cells] * repeat)
+    columns.update({'actor': actors, 'type': types, 'account': accounts, 'balance': balances.reshape(-1)})
+    return pa.table(columns)
+
+
+def run_metadata(engine):
+    return {
+        'economy': engine.economy,
+        'month': engine.model.month,
+        'size': engine.size,
+        'loan_book': engine.loan_book,
+        'params': engine.params
+    }
+
+
+def indicator_table(engine):
+    """An engine's indicators with a month column and the run metadata"""
+    indicators = engine.indicators.to_arrow()
+    if engine.size is None:
+        indicators = indicators.add_column(0, 'month', [engine.indicators.index.astype(np.int32)])
+    return with_metadata(indicators, run_metadata(engine))
+
+
+def save(engine, path, format='arrow'):
+    """Write an engine's indicators, balance sheets and params under directory `path`"""
+    ext = FORMATS[format]
+    os.makedirs(path, exist_ok=True)
+    write_table(indicator_table(engine), os.path.join(path, 'indicators' + ext))
+    write_table(with_metadata(balance_sheet_table(engine.model), run_metadata(engine)), os.path.join(path, 'balance_sheets' + ext))
+    return path
+
+
+def load(path, memory_map=True):
+    """Tables and metadata of a run written by `save`
+
+    Returns {'indicators': IndicatorStore, 'balance_sheets': Arrow table,
+    'economy', 'month', 'size', 'loan_book', 'params'}.
+    """
+    tables = {}
+    for name in ('indicators', 'balance_sheets'):
+        for ext in FORMATS.values():
+            file = os.path.join(path, name + ext)
+            if os.path.exists(file):
+                tables[name] = read_table(file, memory_map=memory_map)
+                break
+        else:
+            raise FileNotFoundError(f'no {name} table in {path}')
+    run = metadata(tables['indicators'])
+    run['indicators'] = IndicatorStore.from_arrow(tables['indicators'])
+    run['balance_sheets'] = tables['balance_sheets']
+    return run
+
+
+def save_frame(df, path, meta=None):
+    """Write a DataFrame, e.g. a `sweep` result, keeping its index"""
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df)
+    if meta is not None:
+        table = with_metadata(table, meta)
+    write_table(table, path)
+    return path
+
+
+def load_frame(path, columns=None, memory_map=True):
+    return read_table(path, columns, memory_map).to_pandas()
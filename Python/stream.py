@@ -0,0 +1,116 @@
+import numpy as np
+
+PERIODS = {'quarterly': 3, 'annual': 12}
+
+
+class MonthRecord:
+    """
+    One streamed month
+
+    `indicators` is {indicator: value} and `deltas`, if asked for, is
+    {(actor, (type, name)): change} over the accounts that moved this
+    month. Values are floats for a single run and length-N arrays for an
+    ensemble.
+    """
+    __slots__ = ('month', 'indicators', 'deltas')
+
+    def __init__(self, month, indicators, deltas=None):
+        self.month = month
+        self.indicators = indicators
+        self.deltas = deltas
+
+    def __repr__(self):
+        return f'MonthRecord(month={self.month}, {len(self.indicators)} indicators, {len(self.deltas or ())} deltas)'
+
+
+class Retention:
+    """
+    What a streamed engine keeps of the months it has yielded
+
+        'all'          everything, as `run` does
+        N              the last N months of indicators and account history
+        'quarterly'    indicators at quarter ends (plus the latest month),
+        'annual'       or at year ends; account history for the latest period
+
+    Bounded policies trim as the run goes, in batches so trimming stays
+    amortized O(1) a month: in between, up to twice the window is held.
+    The journal is cut back to its latest snapshot (every 12 months) before
+    the window.
+    """
+    def __init__(self, policy='all'):
+        self.policy = policy
+        if policy == 'all':
+            self.window, self.period = None, None
+        elif policy in PERIODS:
+            self.window, self.period = PERIODS[policy], PERIODS[policy]
+        elif isinstance(policy, (int, np.integer)) and not isinstance(policy, bool) and policy > 0:
+            self.window, self.period = int(policy), None
+        else:
+            raise ValueError(f"retention must be 'all', 'quarterly', 'annual' or a number of months, not {policy!r}")
+
+    def apply(self, engine, final=False):
+        """Trim the engine's records after a month; `final` trims down to exactly the window"""
+        if self.window is None:
+            return
+        model = engine.model
+        indicators = engine.indicators
+        month = model.month
+        if self.period is not None:
+            # drop last month's row unless it closed a period
+            n = len(indicators)
+            if n > 1 and indicators.index[n - 2] % self.period:
+                keep = np.ones(n, dtype=bool)
+                keep[n - 2] = False
+                indicators.retain(keep)
+        elif len(indicators) > (self.window if final else 2 * self.window):
+            keep = np.zeros(len(indicators), dtype=bool)
+            keep[-self.window:] = True
+            indicators.retain(keep)
+        history = model.history
+        first = history.first if history is not None else model.journal.first if model.journal is not None else month
+        if month - first > (self.window if final else 2 * self.window):
+            model.forget(month - self.window)
+
+
+def balance_deltas(ledger, previous):
+    """Changes since `previous` (a copy of the ledger's balances) as {(actor, account): change}, and the new copy"""
+    balances = ledger.balances
+    if previous.shape != balances.shape:
+        # the ledger opened more accounts since
+        grown = np.zeros_like(balances)
+        grown[:, :previous.shape[1]] = previous
+        previous = grown
+    change = balances - previous
+    moved = change != 0
+    if moved.ndim > 2:
+        moved = moved.any(axis=2)  # <-- an account moved if it did in any economy
+    scalar = ledger.size is None
+    deltas = {}
+    for row, col in zip(*np.nonzero(moved)):
+        value = ledger.money(change[row, col])
+        deltas[ledger.actors[row], ledger.accounts[col]] = float(value) if scalar else value
+    np.copyto(previous, balances)
+    return deltas, previous
+
+
+def stream(engine, months=None, retention='all', deltas=False):
+    """Simulate month after month, yielding a MonthRecord for each (see `Engine.stream`)"""
+    retention = retention if isinstance(retention, Retention) else Retention(retention)
+    model = engine.model
+    scalar = engine.size is None
+    previous = model.ledger.balances.copy() if deltas else None
+    done = 0
+    try:
+        while months is None or done < months:
+            engine.frame()
+            done += 1
+            row = engine.indicators.last()
+            if scalar:
+                row = {col: float(value) for col, value in row.items()}
+            record = MonthRecord(model.month, row)
+            if deltas:
+                record.deltas, previous = balance_deltas(model.ledger, previous)
+            retention.apply(engine)
+            yield record
+    finally:
+        retention.apply(engine, final=True)
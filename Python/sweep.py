@@ -0,0 +1,55 @@
+import itertools
+import numpy as np
+from Python.engine import DEFAULT_MONTHS, Engine
+from Python.parallel import SharedArray, run_chunks
+
+def scenario_grid(grid, base_params=None):
+    """Expand {param: values} into one params dict per grid point"""
+    names = list(grid)
+    values = [np.atleast_1d(grid[name]).tolist() for name in names]
+    scenarios = []
+    for point in itertools.product(*values):
+        params = dict(base_params or {})
+        params.update(zip(names, point))
+        scenarios.append(params)
+    return names, scenarios
+
+
+def _run_scenarios(start, stop, economy, scenarios, months, loan_book, spec):
+    # worker side: write each trajectory straight into the shared result block
+    out = SharedArray.attach(spec)
+    try:
+        for k, params in enumerate(scenarios[start:stop], start):
+            engine = Engine(economy, params, loan_book=loan_book)
+            engine.advance(months)
+            out.array[k] = engine.indicators.values
+    finally:
+        out.close()
+
+
+def sweep(economy, grid, months=None, base_params=None, processes=None, loan_book=False):
+    """Run one trajectory per point of a parameter grid across a process pool
+
+    `grid` maps parameter names to the values to try, e.g.
+    {'budget_surplus': range(-100, 101)}; several parameters are combined as
+    a full product. Workers write indicator rows into shared memory and only
+    the columnar result comes back: a DataFrame indexed by the grid
+    parameters and 'month', with one column per indicator.
+    """
+    months = DEFAULT_MONTHS[economy] if months is None else months
+    names, scenarios = scenario_grid(grid, base_params)
+    columns = Engine(economy).indicators.columns
+    shape = (len(scenarios), months + 1, len(columns))
+
+    with SharedArray(shape) as out:
+        run_chunks(_run_scenarios, len(scenarios), (economy, scenarios, months, loan_book, out.spec), processes)
+        data = out.array.reshape(-1, len(columns)).copy()
+
+    index = [np.repeat([params[name] for params in scenarios], months + 1) for name in names]
+    index.append(np.tile(np.arange(months + 1), len(scenarios)))
+    import pandas as pd
+    return pd.DataFrame(
+        data=data,
+        index=pd.MultiIndex.from_arrays(index, names=names + ['month']),
+        columns=columns
+    )
@@ -1,16 +1,119 @@
+import numpy as np
 import pandas as pd
 import ipywidgets
 import plotly.graph_objects as go
 from ipydatagrid import DataGrid, TextRenderer
 from Python.balancesheet import BalanceSheet
 from plotly.subplots import make_subplots
+from contextlib import ExitStack
+from time import monotonic
+from math import inf
+
+class LiveTrace:
+    """
+    Plotly trace that only sends newly appended points to the front end
+
+    plotly.py can't extend a trace in place, so points go into a short tail
+    trace. Once the tail holds `segment` points it is frozen and a new tail
+    is started with the same style, so each redraw only re-sends the tail.
+    """
+    def __init__(self, fig, trace, column, segment):
+        self.fig = fig
+        self.column = column
+        self.segment = segment
+        self.tail = trace
+        self.start = 0  # <-- first indicator row held by the tail
+        # line segments start on the previous segment's last point so they join up
+        self.overlap = 1 if trace.type == 'scatter' else 0
+        if trace.type == 'scatter' and trace.line.color is None:
+            colorway = fig.layout.template.layout.colorway
+            trace.line.color = colorway[list(fig.data).index(trace) % len(colorway)]
+        trace.legendgroup = trace.legendgroup or trace.uid
+        self.style = trace.to_plotly_json()
+        for key in ['x', 'y', 'uid']:
+            self.style.pop(key, None)
+        self.style['showlegend'] = False
+
+    def draw(self, indicators, stop):
+        """Bring the chart up to indicator row `stop`"""
+        while stop - self.start > self.segment:
+            self.set_tail(indicators, self.start + self.segment)
+            self.start += self.segment - self.overlap
+            self.fig.add_trace(self.style)
+            self.tail = self.fig.data[-1]
+        self.set_tail(indicators, stop)
+
+    def set_tail(self, indicators, stop):
+        self.tail.x = np.arange(self.start, stop)
+        self.tail.y = indicators[self.column][self.start:stop]
+
 
 class View:
+    CHART_SERIES = {
+        'credit': {
+            'gdp': ['12M GDP', 'TTM New Business Formation'],
+            'money_supply': ['TTM Average Money Supply'],
+            'incomes': ['Worker Incomes', 'Capitalist Incomes', 'Firm Incomes']
+        },
+        'fiat': {
+            'gdp': ['12M Nom GDP', '12M Real GDP', 'TTM New Business Formation'],
+            'unemployment': ['Unemployment'],
+            'inflation': ['CPI']
+        }
+    }
+    SPEEDS = [('1 / sec', 1), ('5 / sec', 5), ('20 / sec', 20), ('60 / sec', 60), ('Max', None)]
+    fps = 10  # <-- most repaints per second while a simulation runs
+    segment = 120  # <-- points per trace segment before it is frozen
+    
     def __init__(self, controller):
         self.controller = controller
         
+    def build_live_traces(self):
+        self.live_traces = []
+        for chart, columns in self.CHART_SERIES[self.controller.economy].items():
+            fig = self.widgets[chart]
+            for trace, column in zip(fig.data, columns):
+                self.live_traces.append(LiveTrace(fig, trace, column, self.segment))
+        self.drawn = 0
+        self.last_draw = -inf
+        
+    def refresh(self, force=False):
+        """Repaint balance sheets and charts, at most `fps` times a second unless forced"""
+        now = monotonic()
+        if not force and now - self.last_draw < 1 / self.fps:
+            return
+        self.last_draw = now
+        self.refresh_balance_sheets()
+        self.refresh_charts()
+        
+    def refresh_balance_sheets(self):
+        """Repaint only the grids whose balance sheet changed since they were last painted"""
+        balance_sheets = self.controller.model.balance_sheets
+        for actor, grid in self.widgets['datagrids'].items():
+            bs = balance_sheets[actor]
+            if self.painted[actor] != bs.version:
+                grid.data = bs.df
+                self.painted[actor] = bs.version
+        
+    def refresh_charts(self):
+        """Push new indicator rows to the charts"""
+        indicators = self.controller.engine.indicators
+        n = len(indicators)
+        if n == self.drawn:
+            return
+        figs = {id(trace.fig): trace.fig for trace in self.live_traces}
+        with ExitStack() as stack:
+            # one batched message per figure
+            for fig in figs.values():
+                stack.enter_context(fig.batch_update())
+            for trace in self.live_traces:
+                trace.draw(indicators, n)
+        self.drawn = n
+        
+
     def build_balance_sheets(self):
         actors = self.controller.model.actors
+        self.painted = {name: bs.version for name, bs in self.controller.model.balance_sheets.items()}
         bs_dict = dict(zip(actors, [
             DataGrid(
                 dataframe=balance_sheet.df,
@@ -106,6 +209,9 @@ class View:
         self.widgets['inputs'][1].on_click(self.controller.fiat_econ_1yr)
         self.widgets['inputs'][2].on_click(self.controller.simulate_fiat_econ)
         
+        self.build_run_controls()
+        self.build_live_traces()
+        
     
     def build_credit_widgets(self):
         self.widgets = {}
@@ -169,6 +275,39 @@ class View:
         ]
         
         self.widgets['inputs'][1].on_click(self.controller.simulate_credit_econ)
+        
+        self.build_run_controls()
+        self.build_live_traces()
+    
+    def build_run_controls(self):
+        scheduler = self.controller.scheduler
+        self.widgets['controls'] = [
+            ipywidgets.ToggleButton(
+                description='Pause',
+                layout={'width': '70px'}
+            ),
+            ipywidgets.Button(
+                description='Step',
+                layout={'width': '60px'}
+            ),
+            ipywidgets.Button(
+                description='Stop',
+                layout={'width': '60px'},
+                style=ipywidgets.ButtonStyle(button_color='salmon')
+            ),
+            ipywidgets.Dropdown(
+                options=self.SPEEDS,
+                value=scheduler.rate,
+                description='Speed',
+                layout={'width': '160px'}
+            )
+        ]
+        
+        pause, step, stop, speed = self.widgets['controls']
+        pause.observe(lambda change: self.controller.pause() if change['new'] else self.controller.resume(), names='value')
+        step.on_click(self.controller.step)
+        stop.on_click(self.controller.cancel)
+        speed.observe(lambda change: setattr(scheduler, 'rate', change['new']), names='value')
     
     @staticmethod
     def make_gdp_plot():
@@ -223,7 +362,10 @@ class View:
         title = self.get_title()
         
         # inputs
-        inputs = ipywidgets.HBox(self.widgets['inputs'])
+        inputs = ipywidgets.VBox([
+            ipywidgets.HBox(self.widgets['inputs']),
+            ipywidgets.HBox(self.widgets['controls'])
+        ])
         
         # create balance sheet boxes
         balance_sheets = []